@@ -1,48 +1,67 @@
+import argparse
+import json
+import os
 import pygame
-import copy
-from datetime import datetime
-from random import randint as rint
 from quoridor.constants import *
 from quoridor.game import Game
+from quoridor.render import text
+from quoridor.stats import STATS
 
-pygame.init()
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Quoridor')
-game = Game(WIN, False)
 
-quoridor = FONT.render('Quoridor!', True, BLACK)
-click = FONT.render('Click here to start game.', True, WHITE, BLACK)
+def start_screen():
+    """
+    Opens the window and draws the title screen (nothing is opened when this module is only imported)
+    :return: Window
+    """
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('Quoridor')
+    quoridor = text('Quoridor!', font(), BLACK)
+    click = text('Click here to start game.', font(), WHITE, BLACK)
+    win.fill(TAN)
+    win.blit(quoridor, ((WIDTH - quoridor.get_size()[0]) // 2, 240))
+    win.blit(click, ((WIDTH - click.get_size()[0]) //2, 300))
+    return win
 
-WIN.fill(TAN)
-WIN.blit(quoridor, ((WIDTH - quoridor.get_size()[0]) // 2, 240))
-WIN.blit(click, ((WIDTH - click.get_size()[0]) //2, 300))
 
-
-def main():
+def main(n=ROWS):
+    """
+    :param n: Board size
+    """
+    win = start_screen()
+    game = Game(win, False, n)
+    saved = 0  # Amount of moves played when the position was saved (K_l), K_t takes back every move after it
     run = True
+    clock = pygame.time.Clock()
     while run:
+        clock.tick(FPS)  # Wait for the next frame instead of spinning
         if not game.started:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     run = False
                 if event.type == pygame.MOUSEBUTTONUP:
-                    game.init()
+                    game.init()  # The game draws the whole window on its first frame
                 if event.type == pygame.KEYDOWN:
-                    WIN.fill(TAN)
-                    rules = FONT.render('RULES', True, BLACK)
-                    WIN.blit(rules, ((WIDTH-rules.get_size()[0]) //2, 100))
+                    win.fill(TAN)
+                    rules = text('RULES', font(), BLACK)
+                    win.blit(rules, ((WIDTH-rules.get_size()[0]) //2, 100))
             pygame.display.update()
 
         else:
             if game.winner():
                 print('White wins.') if game.winner()==WHITE else print('Black wins.')
                 run = False
-            if run:  # change to if game.turn == WHITE
+            if run and game.turn == BLACK:  # The computer plays black, it thinks in another process
+                game.ai_poll()
+            if run:
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         run = False
 
-                    if event.type == pygame.MOUSEBUTTONUP:
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):  # What was on the window is gone
+                        game.redraw()
+
+                    if event.type == pygame.MOUSEBUTTONUP and game.turn == WHITE:  # Not while the computer thinks
                         pos = pygame.mouse.get_pos()
                         game.select(pos)
 
@@ -55,53 +74,25 @@ def main():
                         if event.key == pygame.K_f:
                             game.flip()
                         if event.key == pygame.K_g:
-                            time = datetime.now()
                             print(game.all_possible_moves())
-                            print(datetime.now()-time)
+                            if STATS.enabled:  # Where the time went so far
+                                print(json.dumps(STATS.report(), indent=2))
                         if event.key == pygame.K_l:
-                            time = datetime.now()
-                            global x
-                            x = copy.deepcopy(game.board)
-                            print(datetime.now()-time)
+                            saved = len(game.state.history)
                         if event.key == pygame.K_t:
-                            game.board = x
-
-            elif not run:
-                if game.turn == BLACK:
-                    if rint(0, 1) and game.walls_remaining[1] > 0:
-                        game.lift_wall((0, 0))
-                        a = rint(0, 1)
-                        if a == 1:
-                            game.flip()
-                        x, y = rint(1, 7), rint(1, 7)
-                        while not game.place((x, y)) and game.walls_remaining[1] > 0:
-                            x, y = rint(1, 7), rint(1, 7)
-                    else:
-                        piece = game.board.find_pieces()[1]
-                        game.select((piece[0]*TILE_WIDTH+1, piece[1]*TILE_HEIGHT+1+MARGIN))
-                        moves = game.valid_moves
-                        x = rint(0, len(moves)-1)
-                        game.select((moves[x][0]*TILE_WIDTH+1, moves[x][1]*TILE_HEIGHT+1+MARGIN))
-                else:
-                    if rint(0, 1) and game.walls_remaining[0] > 0:
-                        game.lift_wall((0, 0))
-                        a = rint(0, 1)
-                        if a == 1:
-                            game.flip()
-                        x, y = rint(1, 7), rint(1, 7)
-                        while not game.place((x, y)) and game.walls_remaining[0] > 0:
-                            x, y = rint(1, 7), rint(1, 7)
-                    else:
-                        piece = game.board.find_pieces()[0]
-                        game.select((piece[0]*TILE_WIDTH+1, piece[1]*TILE_HEIGHT+1+MARGIN))
-                        moves = game.valid_moves
-                        x = rint(0, len(moves)-1)
-                        game.select((moves[x][0]*TILE_WIDTH+1, moves[x][1]*TILE_HEIGHT+1+MARGIN))
+                            while len(game.state.history) > saved and game.undo():
+                                pass
 
             game.update(pygame.mouse.get_pos())
+    game.close()
 
 
 if __name__ == '__main__':
-    start = datetime.now()
-    main()
-    print(datetime.now()-start)
+    parser = argparse.ArgumentParser(description='Play Quoridor against the computer')
+    parser.add_argument('--size', type=int, default=ROWS, help='board size (rows and columns, 5 to 19 and beyond)')
+    args = parser.parse_args()
+    if os.environ.get('QUORIDOR_STATS'):  # Path of a JSON lines file: profile the game (see quoridor.stats) into it
+        STATS.enable()
+        STATS.start_log(os.environ['QUORIDOR_STATS'])
+    main(args.size)
+    STATS.stop_log()
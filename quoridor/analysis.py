@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from .state import State
+from .search import Search, WIN
+from .records import read_games
+from .cache import Cache
+
+
+def analyze_game(game, nodes=2000, depth=None, budget=None, search=None, cache=None):
+    """
+    :param game: Dictionary with 'n', 'moves' and optionally 'walls' and 'game' (see records.read_games)
+    :param nodes: Nodes the engine searches in every position (the same analysis every time), None for no limit
+    :param depth: Deepest search, None for no limit
+    :param budget: Seconds for every position, None for no limit
+    :param search: search.Search to use, None for a new one. Its table is cleared first, so that the analysis of a game
+    doesn't depend on the games analyzed before it
+    :param cache: cache.Cache with the analysis of earlier runs, None for no cache. Positions it has (searched at least
+    depth deep if depth is given) aren't searched again, and the new ones are added to it
+    :return: Dictionary with 'game', 'n' and 'plies': for the start of the game and the position after every move, the
+    goal distances of both sides, the amount of legal walls of the side to move, the engine's score (positive is good for
+    WHITE), its best move and depth, and the move that was played
+    """
+    if search is None:
+        search = Search()
+    else:
+        search.table.clear()
+    moves = game['moves']
+    state = State(game['n'], game.get('walls'))
+    plies = []
+    for ply in range(len(moves) + 1):
+        cached = None
+        if cache is not None and state.winner() is None:
+            cached = cache.get(state, depth or 0)
+        if cached is not None and cached['walls'] is not None:
+            (hmask, vmask), best, score, reached = cached['walls'], cached['move'], cached['score'], cached['depth']
+        else:
+            hmask, vmask = state.legal_walls()
+            best = search.best_move(state, budget, nodes, depth or 64)
+            score, reached = search.score, search.depth
+            if cache is not None and best is not None:
+                cache.put(state, best, score, reached, (hmask, vmask))
+        score = score if state.turn == 0 else -score  # For WHITE
+        if state.winner() is not None:
+            score = WIN if state.winner() == 0 else -WIN
+        plies.append({'ply': ply, 'turn': state.turn, 'distances': [state.distance(0), state.distance(1)],
+                      'legal_walls': bin(hmask).count('1') + bin(vmask).count('1'), 'eval': score, 'best': best,
+                      'depth': reached, 'played': moves[ply] if ply < len(moves) else None})
+        if ply < len(moves):
+            state.play(moves[ply])
+    return {'game': game.get('game'), 'n': game['n'], 'plies': plies}
+
+
+def _analyze_chunk(games, nodes, depth, budget, cache_path):
+    """
+    Runs in a worker process
+    :param cache_path: File of the cache.Cache the worker opens, None for no cache
+    :return: List of analyze_game results of games
+    """
+    search = Search()
+    cache = Cache(cache_path) if cache_path else None
+    try:
+        return [analyze_game(game, nodes, depth, budget, search, cache) for game in games]
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def analyze(games, workers=None, chunk=4, nodes=2000, depth=None, budget=None, cache=None):
+    """
+    Analyzes many games over a pool of worker processes (see analyze_game). games are sent to the workers chunk at a
+    time, and only a few chunks per worker are read ahead, so memory stays the same however many games there are.
+    :param games: Iterable of games (see records.read_games), only read as the work goes on
+    :param workers: Worker processes, os.cpu_count() if None
+    :param chunk: Games sent to a worker at once
+    :param cache: Path of a cache.Cache shared by the workers (see analyze_game), None for no cache
+    :return: Generator of analyze_game results, in the order of games, each one as soon as it's ready
+    """
+    workers = workers or os.cpu_count() or 1
+    games = iter(games)
+    pending = deque()  # Futures of the chunks sent, oldest first
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            while len(pending) < 2 * workers:  # Keep every worker busy with one chunk waiting behind it
+                batch = [game for _, game in zip(range(chunk), games)]
+                if not batch:
+                    break
+                pending.append(pool.submit(_analyze_chunk, batch, nodes, depth, budget, cache))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze recorded games: distances, legal walls, engine score and best '
+                                                 'move of every ply, written as one JSON line per game')
+    parser.add_argument('games', help='file written by quoridor.selfplay --out (JSON lines or .qgdb game database)')
+    parser.add_argument('--out', default='-', help='file to write the analysis to (default: standard output)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--chunk', type=int, default=4, help='games sent to a worker at once')
+    parser.add_argument('--nodes', type=int, default=2000, help='nodes searched in every position')
+    parser.add_argument('--depth', type=int, default=None, help='deepest search in every position')
+    parser.add_argument('--budget', type=float, default=None, help='seconds of search in every position')
+    parser.add_argument('--cache', default=None, help='sqlite file of analysis kept between runs (see quoridor.cache)')
+    args = parser.parse_args()
+
+    out = sys.stdout if args.out == '-' else open(args.out, 'w')
+    start = perf_counter()
+    games = positions = 0
+    try:
+        for result in analyze(read_games(args.games), args.workers, args.chunk, args.nodes, args.depth, args.budget,
+                              args.cache):
+            out.write(json.dumps(result, separators=(',', ':')) + '\n')
+            games += 1
+            positions += len(result['plies'])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = perf_counter() - start
+    print(f'{games} games, {positions} positions in {seconds:.1f}s ({positions / seconds:.0f} positions/sec)',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import sys
+from time import perf_counter
+from .state import State
+from .paths import UNREACHABLE
+from .search import WIN
+from .records import read_games
+
+np = None  # numpy, imported the first time a batch is evaluated. Only needed here, the game runs without it
+
+FEATURES = ('white_distance', 'black_distance', 'white_walls', 'black_walls', 'turn', 'score')  # Columns of features
+
+
+def _need_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('Batch evaluation needs numpy (pip install numpy)') from None
+
+
+def stack(states):
+    """
+    Packs positions into stacked arrays. Every state must have the same board size.
+    :param states: List of States
+    :return: (pawns (B, 2) squares, walls (B, 2, n-1, n-1) booleans [position, dir, cy-1, cx-1] of every wall slot,
+    walls_left (B, 2), turn (B,))
+    """
+    _need_numpy()
+    n = states[0].n
+    m = n - 1
+    size = (m*m + 7) // 8  # Bytes of one wall bitmask
+    raw = np.frombuffer(b''.join(state.hwalls.to_bytes(size, 'little') + state.vwalls.to_bytes(size, 'little')
+                                 for state in states), dtype=np.uint8)
+    walls = np.unpackbits(raw.reshape(len(states), 2, size), axis=2, bitorder='little')[:, :, :m*m]
+    pawns = np.array([state.pawns for state in states], dtype=np.int64)
+    walls_left = np.array([state.walls_left for state in states], dtype=np.int64)
+    turn = np.array([state.turn for state in states], dtype=np.int64)
+    return pawns, walls.reshape(len(states), 2, m, m).astype(bool), walls_left, turn
+
+
+def open_steps(walls):
+    """
+    :param walls: Stacked walls from stack
+    :return: (right (B, n, n-1), down (B, n-1, n)) booleans, True where a pawn can step from (y, x) to (y, x+1) and from
+    (y, x) to (y+1, x). The same arrays work for the steps back
+    """
+    hwalls, vwalls = walls[:, 0], walls[:, 1]
+    count, m = hwalls.shape[0], hwalls.shape[1]
+    blocked_right = np.zeros((count, m+1, m), dtype=bool)
+    blocked_right[:, :m] |= vwalls  # A vertical wall centered on (x+1, y+1) blocks the steps right of x on rows y, y+1
+    blocked_right[:, 1:] |= vwalls
+    blocked_down = np.zeros((count, m, m+1), dtype=bool)
+    blocked_down[:, :, :m] |= hwalls  # A horizontal wall centered on (x+1, y+1) blocks the steps down from x, x+1 on y
+    blocked_down[:, :, 1:] |= hwalls
+    return ~blocked_right, ~blocked_down
+
+
+def distances(pawns, walls):
+    """
+    Goal distances of both pawns of every position, with one frontier search over the whole batch: every step expands
+    the frontiers of all the positions that haven't reached their goal row yet with a few array shifts. Pawns don't
+    block each other, like State.distance.
+    :param pawns: Stacked pawns from stack
+    :param walls: Stacked walls from stack
+    :return: (B, 2) distances, paths.UNREACHABLE for a pawn that can't reach its goal row
+    """
+    _need_numpy()
+    count, n = len(pawns), walls.shape[2] + 1
+    right, down = open_steps(walls)
+    right, down = np.concatenate([right, right]), np.concatenate([down, down])  # WHITE's searches, then BLACK's
+    squares = np.concatenate([pawns[:, 0], pawns[:, 1]])
+    goal_rows = np.concatenate([np.zeros(count, dtype=np.int64), np.full(count, n-1, dtype=np.int64)])
+    alive = np.arange(2*count)  # Searches that are still going, index into dist
+    front = np.zeros((2*count, n, n), dtype=bool)
+    front[alive, squares // n, squares % n] = True
+    seen = front.copy()
+    dist = np.full(2*count, UNREACHABLE, dtype=np.int64)
+    for k in range(n*n):
+        done = front[np.arange(len(alive)), goal_rows].any(axis=1)  # Frontier reached the goal row
+        dist[alive[done]] = k
+        keep = ~done & front.any(axis=(1, 2))  # Searches with an empty frontier can't reach the goal row
+        if not keep.any():
+            break
+        if not keep.all():  # Only keep expanding the searches that are still going
+            alive, front, seen, right, down, goal_rows = \
+                alive[keep], front[keep], seen[keep], right[keep], down[keep], goal_rows[keep]
+        new = np.zeros_like(front)
+        new[:, :, 1:] |= front[:, :, :-1] & right  # Step right
+        new[:, :, :-1] |= front[:, :, 1:] & right  # Step left
+        new[:, 1:] |= front[:, :-1] & down  # Step down
+        new[:, :-1] |= front[:, 1:] & down  # Step up
+        front = new & ~seen
+        seen |= front
+    return dist.reshape(2, count).T
+
+
+def evaluate(pawns, walls, walls_left, turn):
+    """
+    Same as search.evaluate for every position of the batch
+    :return: (B,) scores from the point of view of the side to move, and the (B, 2) distances
+    """
+    n = walls.shape[2] + 1
+    dist = distances(pawns, walls)
+    rows = np.arange(len(turn))
+    mine, theirs = dist[rows, turn], dist[rows, 1 - turn]
+    scores = 10*(theirs - mine) + 3*(walls_left[rows, turn] - walls_left[rows, 1 - turn]) + 5
+    won = (pawns[:, 0] < n) | (pawns[:, 1] >= n*(n-1))  # The side that just moved won
+    scores[won] = -WIN
+    return scores, dist
+
+
+def features(states):
+    """
+    :param states: List of States of the same board size
+    :return: (B, len(FEATURES)) array of the distances, walls left, side to move and score of every state
+    """
+    pawns, walls, walls_left, turn = stack(states)
+    scores, dist = evaluate(pawns, walls, walls_left, turn)
+    return np.column_stack([dist, walls_left, turn, scores])
+
+
+def evaluate_states(states):
+    """
+    :param states: List of States of the same board size
+    :return: List of scores (search.evaluate) of the states
+    """
+    return evaluate(*stack(states))[0].tolist()
+
+
+def game_positions(record):
+    """
+    :param record: Game written by selfplay (dictionary with 'n' and 'moves')
+    :return: List of States, the start of the game and the position after every move
+    """
+    state = State(record['n'], record.get('walls'))
+    states = [state.clone()]
+    for move in record['moves']:
+        state.play(move)
+        states.append(state.clone())
+    return states
+
+
+def score_games(records, chunk=4096):
+    """
+    Scores every position of many games, chunk positions at a time
+    :param records: Iterable of games written by selfplay
+    :return: Generator of (record, features of its positions)
+    """
+    pending, states = [], []
+    for record in records:
+        positions = game_positions(record)
+        pending.append((record, len(positions)))
+        states.extend(positions)
+        if len(states) >= chunk:
+            yield from _split(pending, features(states))
+            pending, states = [], []
+    if states:
+        yield from _split(pending, features(states))
+
+
+def _split(pending, rows):
+    start = 0
+    for record, count in pending:
+        yield record, rows[start:start+count]
+        start += count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every position of self-play games (JSON lines) with numpy')
+    parser.add_argument('games', help='file written by quoridor.selfplay --out (JSON lines or .qgdb game database)')
+    parser.add_argument('--out', default=None, help='file to write one line of JSON features for each game to')
+    parser.add_argument('--chunk', type=int, default=4096, help='positions scored together')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    positions = 0
+    out = open(args.out, 'w') if args.out else None
+    for record, rows in score_games(read_games(args.games), args.chunk):
+        positions += len(rows)
+        if out is not None:
+            out.write(json.dumps({'game': record.get('game'), 'features': FEATURES, 'rows': rows.tolist()}) + '\n')
+    if out is not None:
+        out.close()
+    seconds = perf_counter() - start
+    print(f'{positions} positions in {seconds:.1f}s ({positions / seconds:.0f} positions/sec)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+from random import Random
+from time import perf_counter
+from .state import State, ROWS, wall_move, VERTICAL, HORIZONTAL
+from .paths import bits, path_length
+from .selfplay import play_game
+from .players import RandomPlayer
+from .search import Search
+from .perft import perft
+
+
+def random_position(rand, plies, wall_chance, n=ROWS):
+    """
+    :return: State of board size n after plies random legal moves (stops early if somebody wins)
+    """
+    state = State(n)
+    for _ in range(plies):
+        walls = []
+        if state.walls_left[state.turn] and rand.random() < wall_chance:
+            walls = [wall_move(slot, dir, state.n) for dir, mask in enumerate(state.legal_walls()) for slot in bits(mask)]
+        move = rand.choice(walls or state.pawn_moves())
+        prev = state.pawns[state.turn]
+        state.play(move)
+        if state.winner() is not None:  # Keep the position from just before the game ended
+            state.unplay(move, prev)
+            break
+    return state
+
+
+def maze_position(rand, n=ROWS):
+    """
+    :return: State of board size n where almost every wall was placed to make the pawns' paths as long as possible (long
+    winding paths), with one or two walls left for each side
+    """
+    state = State(n)
+    keep = rand.randrange(1, 3)
+    while state.walls_left[state.turn] > keep:
+        other = 1 - state.turn
+        best, best_length = None, -1
+        candidates = [(slot, dir) for dir, mask in enumerate(state.legal_walls()) for slot in bits(mask)]
+        for slot, dir in rand.sample(candidates, min(24, len(candidates))):
+            length = state.path_lengths_with(slot, dir, (other,))[0]
+            if length > best_length:
+                best, best_length = wall_move(slot, dir, state.n), length
+        state.play(best)
+    return state
+
+
+def positions(seed=0, count=8, n=ROWS):
+    """
+    Fixed sets of positions for the benchmarks, the same for the same seed
+    :param n: Board size. The midgames are as many plies deep per row as on the standard board
+    :return: Dictionary set name -> list of States
+    """
+    rand = Random(seed)
+    return {
+        'opening': [random_position(rand, rand.randrange(0, 6), 0.2, n) for _ in range(count)],
+        'midgame': [random_position(rand, rand.randrange(16, 30) * n // ROWS, 0.6, n) for _ in range(count)],
+        'maze': [maze_position(rand, n) for _ in range(count)],
+    }
+
+
+def timed(func, min_time):
+    """
+    Calls func until min_time seconds have passed (at least once)
+    :return: (calls, seconds)
+    """
+    calls, start = 0, perf_counter()
+    while True:
+        func()
+        calls += 1
+        seconds = perf_counter() - start
+        if seconds >= min_time:
+            return calls, seconds
+
+
+def state_benchmarks():
+    """
+    :return: Dictionary name -> function(state) for the headless rules
+    """
+    def all_can_place(state):
+        for dir in (HORIZONTAL, VERTICAL):
+            for slot in range((state.n-1)**2):
+                state.can_place(slot, dir)
+
+    def push_pop(state):
+        for move in state.pawn_moves():
+            state.push(move)
+            state.pop()
+
+    def fresh_distances(state):
+        state.dists = [None, None]
+        state.distance(0), state.distance(1)
+
+    return {
+        'state.pawn_moves': lambda state: (state.pawn_moves(0), state.pawn_moves(1)),
+        'state.can_place': all_can_place,
+        'state.path_length': lambda state: (path_length(state, 0), path_length(state, 1)),
+        'state.legal_walls': lambda state: state.legal_walls(),
+        'state.distance_maps': fresh_distances,
+        'state.deepcopy': copy.deepcopy,
+        'state.clone': lambda state: state.clone(),
+        'state.push_pop': push_pop,
+    }
+
+
+def view_benchmarks():
+    """
+    :return: Dictionary name -> (function(state) that makes the Board or Game, function(view)). These need pygame
+    """
+    from .board import Board
+    from .game import Game, COLORS
+    from .pieces import Wall
+
+    def board(state):
+        view = Board(state.n)
+        view.state = state.clone()
+        return view
+
+    def game(state):
+        view = Game(None, n=state.n)
+        view.board = board(state)
+        return view
+
+    def board_can_place(view):
+        for wall in (Wall(HORIZONTAL, (0, 0, 0)), Wall(VERTICAL, (0, 0, 0))):
+            for x in range(view.n):
+                for y in range(view.n):
+                    view.can_place(wall, (x, y))
+
+    def game_can_place(view):
+        if not view.lift_wall((0, 0)):
+            return
+        for _ in range(2):
+            for x in range(view.state.n):
+                for y in range(view.state.n):
+                    view.can_place((x, y))
+            view.flip()
+        view.wall_selected = None
+
+    return {
+        'board.possible_moves': (board, lambda view: view.possible_moves()),
+        'board.can_place': (board, board_can_place),
+        'board.deepcopy': (board, copy.deepcopy),
+        'game.can_place': (game, game_can_place),
+        'game.win_possible': (game, lambda view: (view.win_possible(COLORS[0]), view.win_possible(COLORS[1]))),
+        'game.possible_walls': (game, lambda view: view.possible_walls()),
+    }
+
+
+IMPORTS = ('quoridor.state', 'quoridor.search', 'quoridor.selfplay', 'quoridor.parallel', 'quoridor.game')
+# Modules whose import time is measured. Everything but the game should import without pygame
+
+
+def import_time(module, repeat=3):
+    """
+    Imports module in new interpreters (so nothing is cached in sys.modules)
+    :return: (fastest import in seconds, True if the import loaded pygame)
+    """
+    code = (f'import sys, time; start = time.perf_counter(); import {module}; '
+            f'print(time.perf_counter() - start, "pygame" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Directory the package is in
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times, pygame = [], False
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True,
+                                check=True).stdout.split()
+        times.append(float(output[0]))
+        pygame = output[1] == 'True'
+    return min(times), pygame
+
+
+def run(seed=0, min_time=0.2, only=None, games=10):
+    """
+    Runs every benchmark on every position set
+    :param seed: Seed of the position sets and the random games
+    :param min_time: Seconds to spend on every benchmark and position set
+    :param only: Only run benchmarks whose name contains this
+    :param games: Amount of random games for the 'random_games' benchmark
+    :return: Dictionary with the results, ready to be written as JSON
+    """
+    sets = positions(seed)
+    benches = {name: (None, func) for name, func in state_benchmarks().items()}
+    try:
+        benches.update(view_benchmarks())
+    except ImportError:  # No pygame, only the headless rules can be measured
+        pass
+    results = {}
+    for name, (make, func) in benches.items():
+        if only and only not in name:
+            continue
+        for set_name, states in sets.items():
+            subjects = [make(state) if make else state.clone() for state in states]
+            calls, seconds = timed(lambda: [func(subject) for subject in subjects], min_time)
+            results[f'{name}/{set_name}'] = {'calls': calls * len(subjects), 'seconds': round(seconds, 4),
+                                            'us_per_call': round(seconds / (calls * len(subjects)) * 1e6, 2)}
+    for module in IMPORTS:
+        name = f'import.{module}'
+        if only and only not in name:
+            continue
+        seconds, pygame = import_time(module)
+        results[name] = {'calls': 1, 'seconds': round(seconds, 4), 'us_per_call': round(seconds * 1e6, 2),
+                         'pygame': pygame}
+    if not only or only in 'random_games':
+        rand = Random(seed)
+        start = perf_counter()
+        plies = sum(len(play_game(RandomPlayer(seed=rand.random()), RandomPlayer(seed=rand.random()))[1])
+                    for _ in range(games))
+        seconds = perf_counter() - start
+        results['random_games'] = {'calls': games, 'seconds': round(seconds, 4),
+                                   'us_per_call': round(seconds / games * 1e6, 2), 'plies': plies}
+    if not only or only in 'perft':  # Move generation throughput: every move sequence of 2 plies from the start
+        calls, seconds = timed(lambda: perft(State(), 2), min_time)
+        nodes = calls * perft(State(), 2)
+        results['perft'] = {'calls': nodes, 'seconds': round(seconds, 4), 'nodes_per_sec': round(nodes / seconds),
+                            'us_per_call': round(seconds / nodes * 1e6, 3)}
+    return {'seed': seed, 'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+
+
+def size_curves(sizes, seed=0, min_time=0.1, only=None, games=4):
+    """
+    Timing curves against the board size: the headless benchmarks on midgame and maze positions of every size, search
+    nodes and random games
+    :param sizes: Board sizes
+    :return: Dictionary with the results, ready to be written as JSON. results has an entry for every benchmark and size
+    (like run, so they can be compared), curves[benchmark][size] is its time of one call in microseconds
+    """
+    results, curves = {}, {}
+
+    def add(name, n, calls, seconds):
+        results[f'{name}/n{n}'] = {'calls': calls, 'seconds': round(seconds, 4),
+                                   'us_per_call': round(seconds / calls * 1e6, 2)}
+        curves.setdefault(name, {})[n] = results[f'{name}/n{n}']['us_per_call']
+
+    for n in sizes:
+        sets = positions(seed, 4, n)
+        states = sets['midgame'] + sets['maze']
+        for name, func in state_benchmarks().items():
+            if not only or only in name:
+                subjects = [state.clone() for state in states]
+                calls, seconds = timed(lambda: [func(subject) for subject in subjects], min_time)
+                add(name, n, calls * len(subjects), seconds)
+        if not only or only in 'search.node':
+            search, nodes, seconds = Search(), 0, 0
+            for state in sets['midgame']:
+                search.best_move(state.clone(), min_time)
+                nodes, seconds = nodes + search.nodes, seconds + search.time
+            add('search.node', n, max(1, nodes), seconds)
+        if not only or only in 'random_games':
+            rand = Random(seed)
+            start = perf_counter()
+            for _ in range(games):
+                play_game(RandomPlayer(seed=rand.random()), RandomPlayer(seed=rand.random()), n, 40 * n)
+            add('random_games', n, games, perf_counter() - start)
+    return {'seed': seed, 'python': platform.python_version(), 'machine': platform.machine(), 'sizes': list(sizes),
+            'results': results, 'curves': curves}
+
+
+def compare(old, new, threshold=0.1):
+    """
+    :param old: Results of an earlier run
+    :param new: Results of this run
+    :param threshold: Slowdown (0.1 is 10%) from which a benchmark counts as a regression
+    :return: List of (name, old us per call, new us per call, ratio) of the benchmarks that got slower than threshold
+    """
+    slower = []
+    for name, result in new['results'].items():
+        if name in old['results']:
+            ratio = result['us_per_call'] / old['results'][name]['us_per_call']
+            if ratio > 1 + threshold:
+                slower.append((name, old['results'][name]['us_per_call'], result['us_per_call'], round(ratio, 2)))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the rules hot paths, written as JSON')
+    parser.add_argument('--out', default='-', help='file to write the JSON results to (default: standard output)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the position sets')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds for every benchmark and position set')
+    parser.add_argument('--only', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run, exits with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown that counts as a regression')
+    parser.add_argument('--sizes', default=None, help='comma separated board sizes: time every size instead (curves)')
+    args = parser.parse_args()
+
+    if args.sizes:
+        results = size_curves([int(n) for n in args.sizes.split(',')], args.seed, args.min_time, args.only)
+    else:
+        results = run(args.seed, args.min_time, args.only)
+    text = json.dumps(results, indent=2)
+    if args.out == '-':
+        print(text)
+    else:
+        with open(args.out, 'w') as file:
+            file.write(text + '\n')
+    if args.compare:
+        with open(args.compare) as file:
+            slower = compare(json.load(file), results, args.threshold)
+        for name, old, new, ratio in slower:
+            print(f'{name}: {old}us -> {new}us ({ratio}x)', file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import struct
+import sys
+from time import perf_counter
+from .state import State, ROWS
+from .search import Search, ordered_moves
+from .constants import CACHE_DIR
+
+BOOK = os.path.join(CACHE_DIR, 'book.bin')  # Book loaded by the game if it was built
+MAGIC = b'QBOOK1\n'
+ENTRY = struct.Struct('<QH')  # State.key, move
+
+
+class Book:
+    """
+    Opening book: best move of every position it knows, by State.key (the same in every process)
+    """
+    def __init__(self, moves=None):
+        self.moves = moves if moves is not None else {}  # State.key -> move
+
+    def get(self, state):
+        """
+        :return: Book move of state, None if the position isn't in the book
+        """
+        return self.moves.get(state.key)
+
+    def __len__(self):
+        return len(self.moves)
+
+    def save(self, path=BOOK):
+        """
+        :param path: File to save to, its directory is made if needed
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(b''.join(ENTRY.pack(key, move) for key, move in sorted(self.moves.items())))
+
+    @staticmethod
+    def load(path=BOOK):
+        """
+        :return: Book saved in path, None if there is no such file
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            data = file.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f'{path} is not an opening book')
+        return Book(dict(ENTRY.iter_unpack(data[len(MAGIC):])))
+
+
+def build(plies=4, width=3, budget=2.0, n=ROWS, log=None):
+    """
+    Builds a book offline: every position up to plies moves deep, following the best move of the search and the width
+    best looking moves (see search.ordered_moves) of every position, is searched for budget seconds.
+    :param plies: Depth of the book in plies
+    :param width: Moves (besides the best one) followed from every position
+    :param log: File to write progress to, None for no output
+    :return: Book
+    """
+    book = Book()
+    search = Search()
+    level = [State(n)]
+    for ply in range(plies + 1):
+        start = perf_counter()
+        next_level = []
+        for state in level:
+            if state.key in book.moves or state.winner() is not None:
+                continue
+            move = search.best_move(state, budget)
+            book.moves[state.key] = move
+            if ply < plies:
+                for reply in dict.fromkeys([move] + ordered_moves(state)[:width]):  # Without the duplicate best move
+                    child = state.clone()
+                    child.play(reply)
+                    next_level.append(child)
+        if log is not None:
+            print(f'ply {ply}: {len(level)} positions, {len(book)} in book, {perf_counter() - start:.1f}s', file=log)
+        level = next_level
+    return book
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening book with deep searches')
+    parser.add_argument('--plies', type=int, default=4, help='depth of the book')
+    parser.add_argument('--width', type=int, default=3, help='moves followed from every position besides the best one')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds of search for every position')
+    parser.add_argument('--out', default=BOOK, help=f'file to save the book to (default: {BOOK})')
+    args = parser.parse_args()
+    book = build(args.plies, args.width, args.budget, log=sys.stderr)
+    book.save(args.out)
+    print(f'{len(book)} positions saved to {args.out}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+from time import time
+from .state import zobrist, wall_move, decode_wall
+from .constants import CACHE_DIR
+from .paths import bits
+
+CACHE = os.path.join(CACHE_DIR, 'cache.sqlite')  # Default cache file
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS positions (
+    key INTEGER PRIMARY KEY,  -- canonical_key as a signed 64 bit int
+    move INTEGER,  -- Best move, in the canonical orientation
+    score INTEGER,  -- For the side to move
+    depth INTEGER,
+    hwalls BLOB,  -- Legal wall masks in the canonical orientation, NULL if they weren't stored
+    vwalls BLOB,
+    stamp INTEGER  -- Time of the last write
+);
+CREATE INDEX IF NOT EXISTS eviction ON positions (depth, stamp);
+'''
+
+
+def mirror_square(sq, n):
+    """
+    :return: Square sq mirrored from left to right
+    """
+    return sq - sq % n + n-1 - sq % n
+
+
+def mirror_slots(mask, n):
+    """
+    :return: Wall slot bitmask mirrored from left to right (the slot of the middle point (cx, cy) goes to (n-cx, cy))
+    """
+    m = n - 1
+    mirrored = 0
+    for slot in bits(mask):
+        mirrored |= 1 << slot - slot % m + m-1 - slot % m
+    return mirrored
+
+
+def mirror_move(move, n):
+    """
+    :return: Move mirrored from left to right (pawn move or wall move)
+    """
+    if move < n*n:
+        return mirror_square(move, n)
+    slot, dir = decode_wall(move, n)
+    return wall_move(mirror_slots(1 << slot, n).bit_length() - 1, dir, n)
+
+
+def canonical_key(state):
+    """
+    Zobrist key (the same as State.key) of the position or of its left to right mirror image, whichever is smaller, so
+    that both positions share one entry.
+    :return: (key, True if the key is the one of the mirror image)
+    """
+    n = state.n
+    pawn_keys, wall_keys, left_keys, turn_key = zobrist(n)
+    keys = []
+    for pawns, hwalls, vwalls in ((state.pawns, state.hwalls, state.vwalls),
+                                  ([mirror_square(sq, n) for sq in state.pawns], mirror_slots(state.hwalls, n),
+                                   mirror_slots(state.vwalls, n))):
+        key = pawn_keys[0][pawns[0]] ^ pawn_keys[1][pawns[1]] ^ left_keys[0][state.walls_left[0]] ^ \
+            left_keys[1][state.walls_left[1]] ^ (turn_key if state.turn else 0)
+        for dir, mask in enumerate((hwalls, vwalls)):
+            for slot in bits(mask):
+                key ^= wall_keys[dir][slot]
+        keys.append(key)
+    return (keys[1], True) if keys[1] < keys[0] else (keys[0], False)
+
+
+class Cache:
+    """
+    Analysis results kept on disk between runs, in sqlite: best move, score, depth and legal wall masks, by
+    canonical_key (a position and its mirror image share an entry). Every process opens its own Cache on the same
+    file: the database is in WAL mode, so any amount of processes can read while one writes. Puts are kept in memory and
+    written every few puts (and by flush and close) in one short transaction, so a process only holds the write lock
+    while it writes them and the others don't wait for it. Once there are more than max_entries, the shallowest (then
+    oldest) entries are deleted.
+    """
+    def __init__(self, path=CACHE, max_entries=1000000, readonly=False, commit_every=256):
+        """
+        :param path: sqlite file, made (with its directory) if it doesn't exist yet
+        :param readonly: Only read (put does nothing)
+        :param commit_every: Puts written at once
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.readonly = readonly
+        self.commit_every = commit_every
+        self.pending = {}  # Key -> row of the puts not written yet
+        self.hits = self.misses = 0
+        if readonly:
+            self.db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=30)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.executescript(SCHEMA)
+        self.count = len(self)  # Entries, counted again only when it looks like there are too many (see flush)
+
+    def get(self, state, depth=0):
+        """
+        :param depth: Only entries searched at least this deep
+        :return: Dictionary with 'move', 'score', 'depth' and 'walls' ((horizontal, vertical) legal wall masks, None if
+        they weren't stored) of state, in its own orientation. None if the cache doesn't have the position
+        """
+        key, mirrored = canonical_key(state)
+        key -= 1 << 63
+        row = self.pending.get(key)
+        if row is not None:
+            row = row[1:6] if row[3] >= depth else None
+        else:
+            row = self.db.execute('SELECT move, score, depth, hwalls, vwalls FROM positions '
+                                  'WHERE key = ? AND depth >= ?', (key, depth)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        move, score, depth, hwalls, vwalls = row
+        walls = None
+        if hwalls is not None:
+            walls = int.from_bytes(hwalls, 'little'), int.from_bytes(vwalls, 'little')
+        if mirrored:
+            move = None if move is None else mirror_move(move, state.n)
+            walls = None if walls is None else (mirror_slots(walls[0], state.n), mirror_slots(walls[1], state.n))
+        if move is not None and not state.is_legal(move):  # Two positions with the same key, not this one
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {'move': move, 'score': score, 'depth': depth, 'walls': walls}
+
+    def put(self, state, move, score, depth, walls=None):
+        """
+        Store the analysis of state. An entry that was searched deeper is kept instead (wall masks already stored are
+        kept if walls is None)
+        :param score: Score for the side to move
+        :param walls: (horizontal, vertical) legal wall masks (State.legal_walls), None to not store them
+        """
+        if self.readonly:
+            return
+        key, mirrored = canonical_key(state)
+        key -= 1 << 63  # Signed 64 bit
+        n = state.n
+        if mirrored:
+            move = None if move is None else mirror_move(move, n)
+            walls = None if walls is None else (mirror_slots(walls[0], n), mirror_slots(walls[1], n))
+        size = ((n-1)*(n-1) + 7) // 8
+        hwalls, vwalls = (None, None) if walls is None else (walls[0].to_bytes(size, 'little'),
+                                                             walls[1].to_bytes(size, 'little'))
+        old = self.pending.get(key)
+        if old is not None:
+            if old[3] > depth:
+                return
+            if hwalls is None:
+                hwalls, vwalls = old[4], old[5]
+        self.pending[key] = (key, move, score, depth, hwalls, vwalls, int(time()))
+        if len(self.pending) >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the puts, and make room if there are too many entries
+        """
+        if self.readonly or not self.pending:
+            return
+        rows = list(self.pending.values())
+        self.pending = {}
+        with self.db:  # One transaction
+            self.db.executemany('INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                                'move = excluded.move, score = excluded.score, depth = excluded.depth, '
+                                'hwalls = coalesce(excluded.hwalls, positions.hwalls), '
+                                'vwalls = coalesce(excluded.vwalls, positions.vwalls), stamp = excluded.stamp '
+                                'WHERE excluded.depth >= positions.depth', rows)
+        self.count += len(rows)  # At most, puts of positions already in the cache don't add entries
+        if self.count > self.max_entries:
+            self.count = len(self)  # Other processes write to the same file too
+            extra = self.count - self.max_entries
+            if extra > 0:
+                extra += self.max_entries // 20  # Some room, so that it isn't done again on the next flush
+                with self.db:
+                    self.db.execute('DELETE FROM positions WHERE key IN '
+                                    '(SELECT key FROM positions ORDER BY depth, stamp LIMIT ?)', (extra,))
+                self.count = len(self)
+
+    def __len__(self):
+        """
+        :return: Entries written to the file (a full count, see count for the cheap one)
+        """
+        return self.db.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,5 +1,4 @@
-import pygame.font
-pygame.font.init()
+import os
 
 # Sizes
 WIDTH, HEIGHT = 450, 670
@@ -7,22 +6,15 @@ ROWS = 9  # Amount of rows and columns, board needs to be square so rows=columns
 MARGIN = 110  # Size of margin
 BOARD_HEIGHT = HEIGHT - (2 * MARGIN)  # The height of the board is the height of the window - the heights of the margins
 
-TILE_WIDTH = WIDTH//ROWS  # The width of the tiles is the width of the window // amount of columns
-TILE_HEIGHT = BOARD_HEIGHT//ROWS  # The height of the tiles is the height of the board // amount of rows (==TILE_WIDTH)
-
-WALLS = 10
+WALLS = 10  # Walls of each player on a board of ROWS rows (see wall_count for other sizes)
 WALL_WIDTH = 5
-WALL_HEIGHT = 2 * TILE_HEIGHT  # Each wall is the height of 2 tiles
-PAWN_RADIUS = TILE_WIDTH//3  # The diameter of a pawn is 2/3 the width of a tile
-MOVE_RADIUS = TILE_WIDTH//7  # The diameter of a possible move is 2/7 the width of a tile
-
-# Starting positions
-WHITE_START = ((ROWS-1)//2, ROWS-1)
-BLACK_START = ((ROWS-1)//2, 0)
+FPS = 60  # Frames per second the window is drawn at (at most)
 
 # Font
-FONT = pygame.font.SysFont('Comic Sans ms', 30)
-SMALLFONT = pygame.font.SysFont('Comic Sans ms', 20)
+FONT_NAME = 'Comic Sans ms'
+FONT_SIZE = 30
+SMALLFONT_SIZE = 20
+_fonts = {}  # Size -> font, made the first time the font is used so that importing this doesn't touch pygame
 
 # Colors
 RED = (255, 0, 0)
@@ -35,3 +27,48 @@ BLUE = (0, 0, 255)
 GREEN = (0, 200, 0)
 LIGHT_BLUE = (52, 155, 229)
 LIGHT_PINK = (214, 105, 255)
+
+# Files
+# Per user directory of the analysis cache and the opening book (see quoridor.cache and quoridor.book), set
+# QUORIDOR_CACHE_DIR to keep them somewhere else
+CACHE_DIR = os.environ.get('QUORIDOR_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'quoridor')
+
+
+def wall_count(n=ROWS):
+    """
+    :param n: Board size
+    :return: Walls of each player on a board of n rows: WALLS on the standard board, the same amount per row on others
+    """
+    return max(1, (WALLS * (n-1) + (ROWS-1) // 2) // (ROWS-1))
+
+
+def tile_size(n=ROWS):
+    """
+    :param n: Board size
+    :return: (width, height) of the tiles of a board of n rows. The board always fills the window between the margins
+    """
+    return WIDTH // n, BOARD_HEIGHT // n
+
+
+def font(size=FONT_SIZE):
+    """
+    :param size: Font size
+    :return: The game's font in that size. pygame.font is initialised the first time a font is needed
+    """
+    if size not in _fonts:
+        import pygame.font
+        pygame.font.init()
+        _fonts[size] = pygame.font.SysFont(FONT_NAME, size)
+    return _fonts[size]
+
+
+def __getattr__(name):
+    """
+    FONT and SMALLFONT, made when they are first used (not by from constants import *, use font() there)
+    """
+    if name == 'FONT':
+        return font(FONT_SIZE)
+    if name == 'SMALLFONT':
+        return font(SMALLFONT_SIZE)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
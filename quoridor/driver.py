@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import sys
+from time import perf_counter
+from .search import Search, OutOfBudget, ordered_moves
+from .book import Book, BOOK
+from .stats import STATS
+
+RESTARTS = 3  # Times AIDriver starts the engine process again after it died, before it searches in its own process
+
+class _EngineSearch(Search):
+    """
+    Search of the engine process. Every few hundred nodes it also looks for commands from the game, so a new request
+    stops it right away. A request for the position it is pondering on turns the ponder search into the real one.
+    """
+    def __init__(self, conn, book=None):
+        super().__init__(book=book)
+        self.conn = conn
+        self.pending = None  # Command that stopped the search, handled by the engine loop once the search is over
+        self.ponder_key = None  # State.key of the position pondered on, None while not pondering
+        self.hit = False  # The game asked for the position that was being pondered on
+
+    def check_budget(self):
+        if self.pending is None and self.conn.poll():
+            command = self.conn.recv()
+            if command[0] == 'go' and self.ponder_key is not None and command[1].key == self.ponder_key:
+                self.deadline = perf_counter() + command[2]  # Ponder hit: the same search goes on with a time limit
+                self.ponder_key, self.hit = None, True
+            else:
+                self.pending = command
+        if self.pending is not None:
+            raise OutOfBudget()
+        super().check_budget()
+
+    def expected(self, state, move):
+        """
+        :return: Position after move and the reply the search expects to it (best move in the table), None if the game
+        is over by then
+        """
+        child = state.clone()
+        child.play(move)
+        if child.winner() is not None:
+            return None
+        entry = self.table.get(child.key)
+        reply = entry[3] if entry is not None else None
+        if reply is None or not child.is_legal(reply):
+            moves = ordered_moves(child)
+            if not moves:
+                return None
+            reply = moves[0]
+        child.play(reply)
+        return child if child.winner() is None else None
+
+    def stats(self, pondered):
+        """
+        :return: Search.info of the last search, with the report of stats.STATS while it is enabled in the engine process
+        """
+        stats = dict(self.info(), pondered=pondered)
+        if STATS.enabled:
+            stats['profile'] = STATS.report()
+        return stats
+
+
+def _engine(conn, book_path, ponder, profile):
+    """
+    Main loop of the engine process. Commands: ('go', state, budget) to search state, ('stop',) to stop thinking and
+    ('quit',). Every finished search is answered with ('move', State.key, move, stats). With ponder, the engine goes on
+    thinking about the position after its move and the reply it expects, until the next command.
+    :param profile: Enable stats.STATS in the engine process
+    """
+    if hasattr(os, 'nice'):
+        os.nice(5)  # The window process comes first
+    if profile:
+        STATS.enable()
+    search = _EngineSearch(conn, Book.load(book_path) if book_path else None)
+    while True:
+        command = search.pending or conn.recv()
+        search.pending = None
+        if command[0] == 'quit':
+            return
+        if command[0] != 'go':
+            continue
+        state, budget = command[1], command[2]
+        pondering = False
+        while state is not None:  # Think, then ponder for as long as the opponent plays the expected reply
+            search.ponder_key, search.hit = (state.key if pondering else None), False
+            move = search.best_move(state, None if pondering else budget)
+            search.ponder_key = None
+            if search.pending is not None or (pondering and not search.hit):
+                break  # Stopped, or the ponder search ended before the opponent moved (the table still has it all)
+            conn.send(('move', state.key, move, search.stats(pondering)))
+            state = search.expected(state, move) if ponder and move is not None else None
+            pondering = True
+
+
+class AIDriver:
+    """
+    Runs the engine in its own process so that the window keeps drawing while it thinks. think asks for a move and
+    returns at once, poll is called once per frame and gives the move once it is ready. While the opponent moves the
+    engine ponders on the reply it expects: when that reply is played, the search already running goes on (with its
+    transposition table) instead of starting over. If the engine process dies, it is started again and asked again for
+    the move that was being waited for. After RESTARTS restarts, moves are searched in the window's process instead.
+    """
+    def __init__(self, budget=1.0, ponder=True, book=BOOK):
+        """
+        :param budget: Seconds to think for every move
+        :param ponder: Think on the opponent's time
+        :param book: Path of the opening book, None for no book
+        """
+        self.budget = budget
+        self.ponder = ponder
+        self.book = book if book is not None and os.path.exists(book) else None
+        self.conn = self.process = None
+        self.waiting = None  # State.key of the position a move was asked for, None when no move is expected
+        self.request = None  # (State, budget) of the last think, asked again of a restarted engine
+        self.stats = None  # Statistics of the search of the last move received
+        self.restarts = 0
+        self.local = None  # Search used instead of the engine process once it died too often, None until then
+
+    def start(self):
+        """
+        Start the engine process (done by the first think). It is profiled if stats.STATS is enabled by then
+        """
+        context = multiprocessing.get_context('spawn')  # Forking a process that has a window open isn't safe
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_engine, args=(child, self.book, self.ponder, STATS.enabled),
+                                       daemon=True)
+        self.process.start()
+
+    @property
+    def thinking(self):
+        return self.waiting is not None
+
+    def think(self, state, budget=None):
+        """
+        Ask for the best move of state. Stops any other search of the engine. Doesn't wait for the answer (see poll)
+        :param budget: Seconds to think, None for self.budget
+        """
+        self.waiting = state.key
+        self.request = (state.clone(), self.budget if budget is None else budget)
+        if self.local is not None:
+            return  # Searched by poll
+        if self.process is None:
+            self.start()
+        try:
+            self.conn.send(('go',) + self.request)
+        except (EOFError, OSError):  # The engine is gone (BrokenPipeError, ConnectionResetError)
+            self.engine_died()
+
+    def poll(self):
+        """
+        Doesn't wait, unless the engine process died too often and the move is searched here (see engine_died)
+        :return: Move for the position of the last think once it's found, None until then
+        """
+        if self.waiting is not None and self.local is not None:
+            move = self.local.best_move(*self.request)
+            self.waiting, self.stats = None, self.local.info()
+            return move
+        try:
+            while self.waiting is not None and self.conn.poll():
+                _, key, move, stats = self.conn.recv()
+                if key == self.waiting:  # Moves of positions asked for earlier are dropped
+                    if 'profile' in stats:
+                        STATS.remote['engine'] = stats.pop('profile')
+                    self.waiting, self.stats = None, stats
+                    return move
+        except (EOFError, OSError):
+            self.engine_died()
+        return None
+
+    def cancel(self):
+        """
+        Stop thinking and pondering
+        """
+        self.waiting = None
+        if self.process is not None:
+            try:
+                self.conn.send(('stop',))
+            except (EOFError, OSError):
+                self.engine_died()
+
+    def engine_died(self):
+        """
+        Called when the pipe to the engine process broke: reports it on stderr and starts the engine again, with the
+        last think if a move is still expected. After RESTARTS restarts, moves are searched in this process instead
+        (the window doesn't draw while it thinks, but the game goes on)
+        """
+        process, conn = self.process, self.conn
+        self.process = self.conn = None
+        if process.is_alive():
+            process.terminate()
+        process.join(1)
+        conn.close()
+        if self.restarts < RESTARTS:
+            self.restarts += 1
+            print(f'AI engine process stopped (exit code {process.exitcode}), starting it again', file=sys.stderr)
+            if self.waiting is not None:
+                self.think(*self.request)
+        else:
+            print(f'AI engine process stopped (exit code {process.exitcode}) after {RESTARTS} restarts, the computer '
+                  f'thinks in the game process from now on', file=sys.stderr)
+            self.local = Search(book=Book.load(self.book) if self.book else None)
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.conn.send(('quit',))
+            except (EOFError, OSError):
+                pass  # Already gone
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.conn.close()
+            self.process = self.conn = None
+        self.waiting = None
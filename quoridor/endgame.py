@@ -0,0 +1,93 @@
+from collections import deque
+
+WIN, LOSS, DRAW = 1, -1, 0  # Results for the side to move
+_solved = {}  # (board size, horizontal walls, vertical walls) -> tables of solve_walls, only the last few are kept
+KEEP = 8  # Amount of wall layouts kept in _solved
+MAX_SIZE = 13  # Largest board solved. The tables grow with n**4, bigger boards would take seconds for every layout
+
+
+def solve_walls(state):
+    """
+    Solves every pawn position of the walls of state when nobody has walls left (retrograde analysis): positions
+    where the side to move already lost are the start, a position is won if one move leads to a lost one, and lost once
+    all of its moves lead to won ones. Going through them in the order they are found gives the fastest wins and the
+    slowest losses. Positions never reached (the pawns can keep each other from finishing) are draws.
+    :return: (results, plies, best moves) lists indexed by (white square * n*n + black square) * 2 + side to move
+    """
+    n = state.n
+    squares = n*n
+    scratch = state.clone()
+    size = squares * squares * 2
+    results, plies, best = [DRAW] * size, [0] * size, [None] * size
+    left = [0] * size  # Moves not yet known to lead to a won position for the opponent
+    parents = [[] for _ in range(size)]  # (position, move) that lead to each position
+    queue = deque()
+    for white in range(squares):
+        for black in range(squares):
+            if white == black:
+                continue
+            for turn in (0, 1):
+                i = (white * squares + black) * 2 + turn
+                if white < n or black >= squares - n:  # Somebody reached the goal row, the side to move lost
+                    results[i] = LOSS
+                    queue.append(i)
+                    continue
+                scratch.pawns[0], scratch.pawns[1] = white, black
+                moves = scratch.pawn_moves(turn)
+                left[i] = len(moves)
+                for move in moves:
+                    child = (move * squares + black) * 2 + 1 if turn == 0 else (white * squares + move) * 2
+                    parents[child].append((i, move))
+    while queue:
+        child = queue.popleft()
+        for parent, move in parents[child]:
+            if results[parent] != DRAW:
+                continue
+            if results[child] == LOSS:  # Moving there wins
+                results[parent], plies[parent], best[parent] = WIN, plies[child] + 1, move
+                queue.append(parent)
+            else:
+                left[parent] -= 1
+                if not left[parent]:  # Every move loses, this one (found last) loses the slowest
+                    results[parent], plies[parent], best[parent] = LOSS, plies[child] + 1, move
+                    queue.append(parent)
+    return results, plies, best
+
+
+def solvable(state):
+    """
+    :return: True if solve can be used for state: nobody has walls left and the board isn't too big
+    """
+    return not (state.walls_left[0] or state.walls_left[1]) and state.n <= MAX_SIZE
+
+
+def solve(state):
+    """
+    Exact result of a position where both sides have no walls left, without searching. The tables of the wall layout
+    are made the first time (a fraction of a second) and every position with the same walls is a lookup after that.
+    :param state: State with walls_left 0 for both sides
+    :return: (result for the side to move (WIN, LOSS or DRAW), plies until the game ends (0 for a draw), best move).
+    The move is None only if the game is over. In a draw it is a move that keeps the draw (doesn't lead to a position
+    the opponent wins)
+    """
+    layout = (state.n, state.hwalls, state.vwalls)
+    if layout not in _solved:
+        if len(_solved) >= KEEP:
+            del _solved[next(iter(_solved))]  # Oldest layout
+        _solved[layout] = solve_walls(state)
+    results, plies, best = _solved[layout]
+    squares = state.n * state.n
+    i = (state.pawns[0] * squares + state.pawns[1]) * 2 + state.turn
+    move = best[i]
+    if results[i] == DRAW:  # Any move that doesn't lose
+        move = next((move for move in state.pawn_moves() if results[_after(state, move)] != WIN), None)
+    return results[i], plies[i], move
+
+
+def _after(state, move):
+    """
+    :return: Table index of the position after the pawn move
+    """
+    squares = state.n * state.n
+    white, black = state.pawns
+    return (move * squares + black) * 2 + 1 if state.turn == 0 else (white * squares + move) * 2
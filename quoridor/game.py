@@ -1,18 +1,32 @@
 import pygame
 import pygame.gfxdraw
 import pygame.font
-from copy import copy
 from .constants import *
 from .board import Board
 from .pieces import Wall
+from .state import HORIZONTAL, VERTICAL, wall_slot, slot_pos, to_pos, bits, decode_wall
+from .paths import reachable
+from .search import Search, evaluate
+from .batch import evaluate_states
+from .book import Book
+from .driver import AIDriver
+from .render import Renderer, text as render_text
+
+COLORS = (WHITE, BLACK)  # Color of each side of the state (0 is white, 1 is black)
 
 
 class Game:
     """
     Game class
     """
-    def __init__(self, win, init=True):
+    def __init__(self, win, init=True, n=ROWS):
+        """
+        :param n: Board size, the players get wall_count(n) walls each
+        """
         self.win = win
+        self.n = n
+        self.renderer = None  # Made on the first frame
+        self.driver = None  # Engine process used by ai_poll (driver.AIDriver), started the first time it is needed
         if init:
             self.init()
         else:
@@ -25,81 +39,71 @@ class Game:
         self.started = True
         self.selected = None  # No tile is selected
         self.wall_selected = None  # No wall is lifted
-        self.turn = WHITE  # First turn is WHITE
-        self.board = Board()  # Create board
+        self.board = Board(self.n)  # Create board (the turn and the walls left are kept in its state, first turn is WHITE)
         self.winner = lambda: self.board.winner()  # Returns winner (None if no one is winning)
         self.valid_moves = []  # List of valid moves for selected piece (currently empty because no piece is selected)
-        self.walls = [[Wall(1,RED) for _ in range(WALLS)] for _ in range(2)]  # [player 1 walls, player 2 walls]
-        self.walls_remaining = [WALLS, WALLS]  # First is player 1, second is player 2. Walls left for each player
-        self.possible = self.board.possible_moves()  # Global variable used for win_possible
-        self.min_lengths = []
+        self.walls = [[Wall(1,RED,self.n) for _ in range(wall_count(self.n))] for _ in range(2)]
+        # [player 1 walls, player 2 walls]
+        self.search = Search(book=Book.load())  # Engine used by ai_move (keeps its table between moves, book if built)
+        self.renderer = None  # Whole window is drawn again on the next frame
+        if self.driver is not None:
+            self.driver.cancel()  # Whatever it was thinking about belongs to the old game
 
-    def win_possible(self, pos, path, color, depth=0):
+    @property
+    def state(self):
         """
-        Recursive function that checks if it's possible for a piece of color 'color' to win from its current pos 'pos'
-        :param pos: Position on board that is being checked
-        :param path: List of all tiles that were already checked (so that it doesn't keep checking the same tiles)
-        :param color: Color of piece that is being checked (white needs to get to top, black needs to get to bottom)
+        Headless state of the current board
         """
-        if pos in path:
-            return False
-        path.append(pos)
-        bottom_row = [(i,ROWS-1) for i in range(ROWS-1)]  # All positions in bottom row
-        top_row = [(i,0) for i in range(ROWS-1)]  # All positions in top row
-        if (color == WHITE and pos in top_row) or (color==BLACK and pos in bottom_row):
-            return True
-        else:
-            return any([self.win_possible(p, path, color, depth+1) for p in self.possible[pos]])
-            # Return true if it is possible to win from any of the tiles that the piece can move to
+        return self.board.state
+
+    @property
+    def turn(self):
+        return COLORS[self.board.state.turn]
+
+    @property
+    def walls_remaining(self):
+        """
+        First is player 1, second is player 2. Walls left for each player
+        """
+        return self.board.state.walls_left
+
+    @property
+    def min_lengths(self):
+        """
+        Shortest path lengths to the goal row of [player 1, player 2], from the distance maps kept by the state
+        """
+        return [self.state.distance(0), self.state.distance(1)]
+
+    def win_possible(self, color):
+        """
+        Checks if it's possible for the piece of color 'color' to get to its goal row (white needs to get to top, black
+        needs to get to bottom). Pawns don't block the way.
+        """
+        return reachable(self.state, COLORS.index(color))
 
     def can_place(self, pos):
-        if self.board.can_place(self.wall_selected, pos):  # If walls aren't intercepting, crossing each other
-            self.board.place_wall(self.wall_selected, pos)  # Place wall (only for sake of seeing if move is illegal
-            pieces = self.board.find_pieces()  # Positions of both pieces
-            self.possible = self.board.possible_moves()  # Only needed for win_possible function. Dict of all moves
-            x = self.win_possible(pieces[1], [], BLACK) and self.win_possible(pieces[0 ], [], WHITE)  # True if move is legal
-            self.unplace_last_wall()  # Unplace wall (this function is only supposed to check if the wall can be placed)
-            self.min_lengths = []
-            return x  # If move is legal, return true else false
-        return False  # Wall can't be placed because it's illegal
+        """
+        :return: True if the selected wall can be placed in pos without blocking any of the players completely
+        """
+        slot = wall_slot(pos, self.wall_selected.dir, self.n)
+        return slot is not None and self.state.can_place(slot, self.wall_selected.dir)
 
     def place(self, pos):
         x = self.turn == BLACK  # x=0 if turn is white and 1 if turn is black
         if self.walls_remaining[x] > 0 and self.can_place(pos):  # If the placement isn't intercepting another wall
-            self.board.place_wall(self.wall_selected, pos)  # Place the wall in pos
-            self.walls_remaining[x] -= 1
+            self.board.place_wall(self.wall_selected, pos)  # Place the wall in pos (this also uses up one wall)
             self.next_turn()
             return True  # Wall was successfully placed
         return False
 
-    def unplace_last_wall(self):
-        """
-        This function will only be called right after someone made an illegal move (completely blocked other player).
-        Therefore, if the turn is WHITE, the one who made the illegal move is WHITE and the wall that must be removed
-        is the last WHITE wall. Walls_remaining didn't subtract 1 yet
-        """
-        self.board.unplace_wall(self.wall_selected)
-
     def possible_walls(self):
         """
-        This will be a heavy function because it will check for each wall placement possible if the wall can be placed.
-        This function will be called at the beginning of the turn for the ai, therefore no wall has been lifted yet.
-        :return: List of all possible wall positions.
-        """
-        walls = [[],[]]
-        if self.lift_wall((WIDTH,HEIGHT)):  # Lift outside of board
-            for i in range(ROWS):  # Check all vertical walls
-                for j in range(ROWS):
-                    if self.can_place((i,j)):
-                        walls[1].append((i,j))
-            self.flip()
-            for i in range(ROWS):  # Check all horizontal walls
-                for j in range(ROWS):
-                    if self.can_place((i,j)):
-                        walls[0].append((i,j))
-            self.flip()
-            self.wall_selected = None
-        return walls
+        This function will be called at the beginning of the turn for the ai.
+        :return: List of all possible wall positions. [horizontal walls, vertical walls] (empty if no walls are left)
+        """
+        hmask, vmask = self.state.legal_walls()
+        return [[slot_pos(slot, HORIZONTAL, self.n) for slot in bits(hmask)],
+                [slot_pos(slot, VERTICAL, self.n) for slot in bits(vmask)]]
 
     def flip(self):
         """
@@ -114,9 +118,10 @@ class Game:
         :param pos: Given x,y position of selected section
         :return: True if worked, False if not
         """
-        board_pos = (pos[0] // TILE_WIDTH, (pos[1] - MARGIN) // TILE_HEIGHT)
+        w, h = self.board.tile_width, self.board.tile_height
+        board_pos = (pos[0] // w, (pos[1] - MARGIN) // h)
         if self.wall_selected:  # If a wall is being placed by a human player
-            board_pos = (round(pos[0]/TILE_WIDTH), round((pos[1] - MARGIN) / TILE_HEIGHT))  # Closest position to mouse
+            board_pos = (round(pos[0]/w), round((pos[1] - MARGIN) / h))  # Closest position to mouse
             self.place(board_pos)
             if self.wall_selected:  # If failed to place a wall
                 self.wall_selected = None
@@ -129,13 +134,13 @@ class Game:
                 self.valid_moves = []  # No piece selected so no possible moves
                 self.select(pos)  # Select the new tile that was clicked.
 
-        if board_pos[1] > ROWS-1 or board_pos[0] > ROWS-1:
+        if board_pos[1] > self.n-1 or board_pos[0] > self.n-1:
             return False  # If selected beyond range, return False
         piece = self.board.get_piece(board_pos)  # Piece at tile that was selected (if no piece, piece=0)
 
         if piece != 0 and piece.color == self.turn:
             self.selected = piece  # Next time the board is clicked, the select function will run on this piece
-            self.valid_moves = self.board.possible_moves()[(piece.pos[0], piece.pos[1])]  # Update valid moves
+            self.valid_moves = [to_pos(sq, self.n) for sq in self.state.pawn_moves()]  # Update valid moves
             return True  # The piece has been successfully selected
         return False  # No piece has been selected
 
@@ -145,7 +150,7 @@ class Game:
         :param pos: Position which the selected piece (self.selected) will be moving to
         :return: True if piece was able to move according to rules, false otherwise
         """
-        if pos[1]>ROWS-1 or pos[0]>ROWS-1:  # If pos is above or below the board
+        if pos[1]>self.n-1 or pos[0]>self.n-1:  # If pos is above or below the board
             return False  # Can't move the piece above the board or under, return false
 
         piece = self.board.get_piece(pos)  # Needs to be 0, if not then the piece cannot move to the given place
@@ -158,37 +163,38 @@ class Game:
 
     def next_turn(self):
         """
-        Reset the selections and change the turn
+        Reset the selections. The turn was already changed by the state when the move was played
         """
         self.valid_moves = []  # There are no valid moves because no pawn has been selected
         self.wall_selected = None  # Unselect any walls when changing turns
 
-        if self.turn == WHITE:
-            self.turn = BLACK
-        else:
-            self.turn = WHITE
-        print(self.possible)
-
-    def draw_moves(self, moves):
+    def move_items(self, moves):
         """
-        Draw all possible moves for selected pawn.
+        Circles of all possible moves for selected pawn, as render items (see render.Renderer)
         :param moves: List of all possible moves. (self.valid_moves)
         """
-        for move in moves:
-            row, col = move
-            pygame.gfxdraw.aacircle(self.win, row*TILE_WIDTH + TILE_WIDTH // 2,
-                                    col*TILE_HEIGHT + TILE_HEIGHT // 2 + MARGIN, MOVE_RADIUS, GRAY)
+        items = []
+        w, h = self.board.tile_width, self.board.tile_height
+        radius = w // 7  # The diameter of a possible move is 2/7 the width of a tile
+        for row, col in moves:
+            x, y = row*w + w // 2, col*h + h // 2 + MARGIN
+            items.append((('move', x, y), pygame.Rect(x - radius - 1, y - radius - 1, 2*radius + 3, 2*radius + 3),
+                          lambda win, x=x, y=y: pygame.gfxdraw.aacircle(win, x, y, radius, GRAY)))
+        return items
 
     def walls_left(self):
         """
-        Writes in margins how many walls are left for each player
+        How many walls are left for each player, written in the margins. As render items (see render.Renderer)
         """
-        txt = [0,0]
+        items = []
         for i in range(2):
-            txt[i] = FONT.render(f'{self.walls_remaining[i]} walls left.', True, BLACK)
-            w, h = txt[i].get_size()
-            self.win.blit(txt[i],
-                          ((WIDTH - w) // 2, (MARGIN + BOARD_HEIGHT) * (1 - i) + (MARGIN - h) // 2))
+            text = f'{self.walls_remaining[i]} walls left.'
+            surface = render_text(text, font(), BLACK)  # Only rasterized when the amount changes
+            w, h = surface.get_size()
+            pos = ((WIDTH - w) // 2, (MARGIN + BOARD_HEIGHT) * (1 - i) + (MARGIN - h) // 2)
+            items.append((('text', i, text), pygame.Rect(pos, (w, h)),
+                          lambda win, surface=surface, pos=pos: win.blit(surface, pos)))
+        return items
 
     def all_possible_moves(self):
         return {'moves':self.valid_moves, 'walls':self.possible_walls()}
@@ -202,32 +208,113 @@ class Game:
         :param pos: Mouse position.
         """
         if self.selected:
-            self.select((ROWS,ROWS))  # If a piece was chosen, unselect the piece and select a wall instead.
+            self.select((0,0))  # If a piece was chosen, unselect it (by clicking the margin) and select a wall instead.
         turn = self.turn == BLACK
         if self.walls_remaining[turn] == 0:
             return False  # If player 1 has no walls left, they can't lift another wall
-        self.wall_selected = self.walls[turn][WALLS-self.walls_remaining[turn]]
+        self.wall_selected = self.walls[turn][len(self.walls[turn])-self.walls_remaining[turn]]
         self.wall_selected.lift(pos)  # Lift the first wall in the list which hasn't been placed yet
         return True
 
     def update(self, pos=None):
         """
         Every frame, the update function will run. This takes care of the graphics so that they truly remain correct
-        throughout each frame
+        throughout each frame. Only the parts of the window that changed are drawn and updated (see render.Renderer)
         :param pos: Mouse position
         """
-        self.board.draw(self.win)  # This will draw the tiles, walls and pawns
-        self.draw_moves(self.valid_moves)  # This will draw the possible moves as long as there is a selected piece
-        self.walls_left()  # This updates in the margins that they will have the correct amount written
+        if self.renderer is None:
+            self.renderer = Renderer(self.win, self.board.draw_background)
+        items = self.board.items()  # Walls and pawns
+        items += self.move_items(self.valid_moves)  # The possible moves as long as there is a selected piece
+        items += self.walls_left()  # Walls left of each player in the margins
         if self.wall_selected:  # If a wall is being lifted, constantly make the wall follow the position of mouse
             self.lift_wall(pos)
-            self.wall_selected.draw(self.win)
-        pygame.display.update()
+            items.append((('lifted',) + self.wall_selected.key(), self.wall_selected.rect(), self.wall_selected.draw))
+        self.renderer.draw(items)
+
+    def redraw(self):
+        """
+        Draw the whole window again on the next frame, for when its contents were lost (the window was covered or
+        restored). Only needed once the game has drawn its first frame
+        """
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
+    def undo(self):
+        """
+        Take back the last move
+        :return: True if a move was taken back
+        """
+        self.selected = None
+        self.next_turn()
+        if self.driver is not None:
+            self.driver.cancel()
+        return self.board.undo()
 
-    def evaluate(self):
+    def evaluate(self, moves=None):
         """
         Used for ai
+        :param moves: If given, score the position after each of these moves instead, all at once with the numpy batch
+        evaluator (batch.evaluate_states)
         :return: The value of the current position (how good it is for the white player). White will want to
-        maximize this value while black will want to minimize it (minimax).
+        maximize this value while black will want to minimize it (minimax). A list of values if moves is given.
+        """
+        if moves is not None:
+            states = []
+            for move in moves:
+                state = self.state.clone()
+                state.play(move)
+                states.append(state)
+            scores = evaluate_states(states)  # From the point of view of the other player, whose turn it is after move
+            return [-score if self.turn == WHITE else score for score in scores]
+        score = evaluate(self.state)  # From the point of view of the player whose turn it is
+        return score if self.turn == WHITE else -score
+
+    def play_move(self, move):
+        """
+        Play a move given the way the state encodes it (pawn square or wall move) for the player whose turn it is.
+        :param move: Move, has to be legal
+        """
+        turn = self.turn == BLACK
+        if move < self.state.n * self.state.n:
+            self.board.move(self.board.pieces[turn], to_pos(move, self.n))
+        else:
+            slot, dir = decode_wall(move, self.n)
+            wall = self.walls[turn][len(self.walls[turn])-self.walls_remaining[turn]]  # First one not placed yet
+            wall.dir = dir
+            self.board.place_wall(wall, slot_pos(slot, dir, self.n))
+        self.selected = None
+        self.next_turn()
+
+    def ai_move(self, budget=1.0):
+        """
+        Let the computer play for the player whose turn it is
+        :param budget: Seconds the computer can think
+        """
+        move = self.search.best_move(self.state, budget)
+        if move is not None:
+            self.play_move(move)
+
+    def ai_poll(self, budget=1.0):
+        """
+        ai_move that doesn't block, called once per frame while it's the computer's turn: the engine thinks in its own
+        process (see driver.AIDriver) and the move is played on the first frame after it's found.
+        :param budget: Seconds the computer can think
+        :return: True if the computer moved
+        """
+        if self.driver is None:
+            self.driver = AIDriver(budget)
+        if self.driver.waiting != self.state.key:  # Not thinking about this position yet
+            self.driver.think(self.state, budget)
+        move = self.driver.poll()
+        if move is None:
+            return False
+        self.play_move(move)
+        return True
+
+    def close(self):
+        """
+        Stop the engine process
         """
-        pass
+        if self.driver is not None:
+            self.driver.close()
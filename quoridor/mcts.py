@@ -0,0 +1,260 @@
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import log, sqrt
+from random import Random
+from time import perf_counter
+from .state import State, wall_move
+from .paths import cut_slots, shortest_path, bits
+from .search import ordered_moves
+from . import endgame
+
+_worker = {}  # MCTS of the current worker process (root parallel search)
+
+
+class Node:
+    """
+    Node of the search tree. wins are counted for side, the player who played move to get to this node.
+    """
+    __slots__ = ('move', 'side', 'key', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, side, key, parent=None):
+        self.move = move
+        self.side = side
+        self.key = key  # State.key of the position in this node
+        self.parent = parent
+        self.children = []
+        self.untried = None  # Moves that don't have a child yet, made when the node is first expanded
+        self.visits = 0
+        self.wins = 0
+
+
+class MCTS:
+    """
+    Monte Carlo tree search (UCT). Playouts are played on the State itself and taken back afterwards. The tree is kept
+    between moves and reused if the new position is already in it.
+    """
+    def __init__(self, exploration=1.4, max_nodes=200000, wall_chance=0.25, max_plies=300, seed=None):
+        """
+        :param exploration: UCT exploration constant
+        :param max_nodes: The tree stops growing when it has this many nodes (playouts keep going from its leaves)
+        :param wall_chance: Chance that a rollout places a wall instead of stepping, while walls are left
+        :param max_plies: Rollouts longer than this are decided by the goal distances
+        :param seed: Seed of the random generator of the rollouts
+        """
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.wall_chance = wall_chance
+        self.max_plies = max_plies
+        self.rand = Random(seed)
+        self.root = None
+        self.size = 0  # Amount of nodes in the tree
+        self.playouts = 0  # Playouts of the last call to best_move
+        self.time = 0
+
+    def best_move(self, state, budget=1.0, playouts=None):
+        """
+        :param state: State. Changed during the search, but left the way it was
+        :param budget: Seconds to think, None for no limit
+        :param playouts: Maximum amount of playouts, None for no limit
+        :return: Most visited move of the root, None if the game is over
+        """
+        if state.winner() is not None:
+            return None
+        if endgame.solvable(state):  # Race without walls, solved exactly
+            move = endgame.solve(state)[2]
+            if move is not None:
+                return move
+        self.run(state, budget, playouts)
+        return max(self.root.children, key=lambda child: child.visits).move
+
+    def run(self, state, budget=1.0, playouts=None):
+        """
+        Play playouts from state until the budget runs out
+        """
+        start = perf_counter()
+        self.reuse(state)
+        self.playouts = 0
+        while (playouts is None or self.playouts < playouts) and \
+                (budget is None or perf_counter() - start < budget or not self.root.children):
+            self.playout(state)
+            self.playouts += 1
+        self.time = perf_counter() - start
+
+    def reuse(self, state):
+        """
+        Make the node of state the root, if it's the root or up to two plies below it. Start a new tree otherwise.
+        """
+        node = None
+        if self.root is not None:
+            near = [self.root] + self.root.children + [grand for child in self.root.children for grand in child.children]
+            node = next((near_node for near_node in near if near_node.key == state.key), None)
+        if node is None:
+            node = Node(None, 1 - state.turn, state.key)
+        node.parent = None
+        self.root = node
+        self.size = self.count(node)
+
+    def count(self, node):
+        nodes, size = [node], 0
+        while nodes:
+            node = nodes.pop()
+            size += 1
+            nodes.extend(node.children)
+        return size
+
+    def playout(self, state):
+        """
+        One playout: go down the tree, add one node, play the rest of the game randomly and count the result
+        """
+        node, played = self.root, 0
+        while node.children and (not node.untried or self.size >= self.max_nodes):  # Selection
+            node = self.select(node)
+            state.push(node.move)
+            played += 1
+        if state.winner() is None and self.size < self.max_nodes:  # Expansion
+            if node.untried is None:
+                node.untried = ordered_moves(state)[::-1]  # Best looking moves are tried first
+            if node.untried:
+                move = node.untried.pop()
+                side = state.turn
+                state.push(move)
+                played += 1
+                child = Node(move, side, state.key, node)
+                node.children.append(child)
+                node = child
+                self.size += 1
+        winner = self.rollout(state)
+        while node is not None:  # Backpropagation
+            node.visits += 1
+            node.wins += node.side == winner
+            node = node.parent
+        for _ in range(played):
+            state.pop()
+
+    def select(self, node):
+        """
+        :return: Child of node with the best UCT value
+        """
+        c = self.exploration * sqrt(log(node.visits + 1))
+        return max(node.children, key=lambda child: child.wins / child.visits + c / sqrt(child.visits)
+                   if child.visits else float('inf'))
+
+    def rollout(self, state):
+        """
+        Plays random moves from state until the game is decided, then takes them back. Pawns walk down their distance
+        map (a random one of the best steps), walls are picked from the slots that block the opponent's shortest path.
+        Once no walls are left the game is a race, and it's decided by the distances.
+        :return: Winning side
+        """
+        played = 0
+        rand = self.rand
+        winner = state.winner()
+        while winner is None:
+            me, other = state.turn, 1 - state.turn
+            if not (state.walls_left[0] or state.walls_left[1]) or played >= self.max_plies:
+                winner = me if state.distance(me) <= state.distance(other) else other  # Side to move wins ties
+                break
+            move = None
+            if state.walls_left[me] and rand.random() < self.wall_chance:
+                move = self.random_wall(state, other)
+            if move is None:
+                dist = state.distance_map(me)
+                moves = state.pawn_moves()
+                best = min(dist[sq] for sq in moves)
+                move = rand.choice([sq for sq in moves if dist[sq] == best])
+            state.push(move)
+            played += 1
+            winner = state.winner()
+        for _ in range(played):
+            state.pop()
+        return winner
+
+    def random_wall(self, state, side):
+        """
+        :return: Random legal wall move that blocks the shortest path of side, None if there isn't one
+        """
+        masks = cut_slots(shortest_path(state, side), state.n)
+        free = state.free_slots()
+        slots = [(slot, dir) for dir in (0, 1) for slot in bits(masks[dir] & free[dir])]
+        self.rand.shuffle(slots)
+        for slot, dir in slots[:4]:
+            if None not in state.path_lengths_with(slot, dir):
+                return wall_move(slot, dir, state.n)
+        return None
+
+
+def _init_worker(kwargs):
+    _worker['mcts'] = MCTS(**kwargs)
+
+
+def _run(state, budget, playouts, seed):
+    """
+    Runs in a worker process.
+    :return: (visits of every root move, amount of playouts)
+    """
+    mcts = _worker['mcts']
+    mcts.rand.seed(seed)
+    mcts.run(state, budget, playouts)
+    return {child.move: child.visits for child in mcts.root.children}, mcts.playouts
+
+
+class ParallelMCTS:
+    """
+    Root parallel MCTS: every worker process grows its own tree from the same position, and the visits of the root moves
+    of all trees are added up.
+    """
+    def __init__(self, workers=4, seed=None, **kwargs):
+        """
+        :param kwargs: Arguments for the MCTS of every worker
+        """
+        self.workers = workers
+        self.rand = Random(seed)
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(kwargs,))
+        self.playouts = 0
+        self.time = 0
+
+    def best_move(self, state, budget=1.0, playouts=None):
+        """
+        :param playouts: Maximum amount of playouts for each worker, None for no limit
+        """
+        if state.winner() is not None:
+            return None
+        start = perf_counter()
+        futures = [self.pool.submit(_run, state, budget, playouts, self.rand.getrandbits(32))
+                   for _ in range(self.workers)]
+        visits = Counter()
+        self.playouts = 0
+        for future in futures:
+            counts, done = future.result()
+            visits.update(counts)
+            self.playouts += done
+        self.time = perf_counter() - start
+        return visits.most_common(1)[0][0]
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Playouts per second of MCTS from the starting position')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds to think')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (root parallel if more than 1)')
+    args = parser.parse_args()
+    if args.workers > 1:
+        with ParallelMCTS(args.workers) as mcts:
+            move = mcts.best_move(State(), args.budget)
+    else:
+        mcts = MCTS()
+        move = mcts.best_move(State(), args.budget)
+    print(f'move {move}: {mcts.playouts} playouts, {round(mcts.playouts / mcts.time)} playouts/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from time import perf_counter
+from .state import State
+from .search import Search, TranspositionTable, known_move
+
+_worker = {}  # Objects of the current worker process: shared memory and search
+
+
+class SharedTable(TranspositionTable):
+    """
+    Transposition table kept in shared memory so that all the worker processes read and write the same entries.
+    Every entry is two 64 bit words: the data packed into one int, and the key xor the data. Writes aren't locked, an
+    entry that was half written by two processes at once just won't match its key anymore.
+    Data bits: score + 2**31 (32), depth (8), kind (2), move + 1 (16), age % 32 (5), 1 (so no entry is all zeros).
+    """
+    def __init__(self, size=1 << 20, name=None):
+        """
+        :param size: Amount of entries, must be a power of 2
+        :param name: Name of shared memory made by another SharedTable, None to make new shared memory
+        """
+        self.size = size
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=16*size)
+        self.name = self.shm.name
+        self.keys = self.shm.buf[:8*size].cast('Q')
+        self.data = self.shm.buf[8*size:].cast('Q')
+        self.age = 0
+        self.probes = self.hits = 0
+
+    def get(self, key):
+        self.probes += 1
+        i = key & (self.size-1)
+        data = self.data[i]
+        if data and self.keys[i] ^ data == key:
+            self.hits += 1
+            return ((data >> 32) & 0xff, (data & 0xffffffff) - (1 << 31), (data >> 40) & 3,
+                    ((data >> 42) & 0xffff) - 1 if (data >> 42) & 0xffff else None, (data >> 58) & 31)
+        return None
+
+    def put(self, key, depth, score, kind, move):
+        i = key & (self.size-1)
+        old = self.data[i]
+        age = self.age % 32
+        if not old or self.keys[i] ^ old == key or (old >> 58) & 31 != age or depth >= (old >> 32) & 0xff:
+            data = (score + (1 << 31)) | min(depth, 0xff) << 32 | kind << 40 | (0 if move is None else move+1) << 42 | \
+                age << 58 | 1 << 63
+            self.data[i] = data
+            self.keys[i] = key ^ data
+
+    def clear(self):
+        self.shm.buf[:] = bytes(16*self.size)
+
+    def close(self, unlink=False):
+        """
+        Let go of the shared memory. The process that made it should unlink it when everyone is done.
+        """
+        self.keys.release()
+        self.data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _init_worker(name, size):
+    table = SharedTable(size, name)
+    _worker['table'] = table
+    _worker['search'] = Search(table)
+
+
+def _search(state, budget, nodes, age, helper):
+    """
+    Runs in a worker process.
+    :param helper: Index of the worker. Odd helpers start one ply deeper so that they fill the table ahead of the others
+    :return: (move, depth, score, nodes)
+    """
+    search = _worker['search']
+    search.table.age = age - 1  # best_move adds 1
+    move = search.best_move(state, budget, nodes, first_depth=1 + helper % 2)
+    return move, search.depth, search.score, search.nodes
+
+
+class ParallelSearch:
+    """
+    Lazy SMP: every worker process searches the same position at the same time, with one transposition table in shared
+    memory. Workers skip the parts of the tree that another worker already stored, so together they get deeper than one
+    process would. The move of the worker that finished the deepest iteration is played.
+    """
+    def __init__(self, workers=4, size=1 << 20, book=None):
+        """
+        :param book: Opening book (book.Book), None for no book
+        """
+        self.workers = workers
+        self.book = book
+        self.table = SharedTable(size)
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.table.name, size))
+        self.nodes = self.depth = self.score = 0
+        self.time = 0
+
+    def best_move(self, state, budget=1.0, nodes=None):
+        """
+        :param state: State
+        :param budget: Seconds to think
+        :param nodes: Maximum amount of nodes for each worker, None for no limit
+        :return: Best move found, None if the game is over
+        """
+        start = perf_counter()
+        known = known_move(state, self.book)
+        if known is not None:  # Book move or solved race, no need to wake the workers
+            move, score = known
+            self.nodes = self.depth = 0
+            self.score = score if score is not None else 0
+            self.time = perf_counter() - start
+            return move
+        self.table.new_search()
+        futures = [self.pool.submit(_search, state, budget, nodes, self.table.age, i) for i in range(self.workers)]
+        results = [future.result() for future in futures]
+        self.time = perf_counter() - start
+        self.nodes = sum(result[3] for result in results)
+        move, self.depth, self.score, _ = max(results, key=lambda result: result[1])  # First worker wins ties
+        return move
+
+    def close(self):
+        self.pool.shutdown()
+        self.table.close(unlink=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def scaling(counts=(1, 2, 4, 8), budget=2.0, positions=None):
+    """
+    Measures how the parallel search scales with the amount of workers
+    :param counts: Amounts of workers to try
+    :param budget: Seconds for each search
+    :param positions: States to search, the starting position if None
+    :return: List of dictionaries, one for each amount of workers
+    """
+    positions = positions or [State()]
+    report = []
+    for workers in counts:
+        with ParallelSearch(workers) as search:
+            search.best_move(State(), 0.05)  # Start the worker processes before timing
+            nodes = seconds = depth = 0
+            for state in positions:
+                search.table.clear()
+                search.best_move(state, budget)
+                nodes, seconds, depth = nodes + search.nodes, seconds + search.time, depth + search.depth
+        report.append({'workers': workers, 'nodes': nodes, 'seconds': round(seconds, 3),
+                       'nps': round(nodes / seconds), 'depth': depth / len(positions)})
+    for row in report:
+        row['speedup'] = round(row['nps'] / report[0]['nps'], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nodes per second of the parallel search for different amounts of '
+                                                 'worker processes')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds for each search')
+    args = parser.parse_args()
+    for row in scaling(args.workers, args.budget):
+        print(f"{row['workers']} workers: {row['nps']} nodes/sec, depth {row['depth']}, speedup {row['speedup']}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+from .tables import tables
+
+UNREACHABLE = 1 << 16  # Distance of squares that can't reach the goal row
+_goals = {}  # Board size -> (goal row bitboard of WHITE, goal row bitboard of BLACK)
+
+
+def goal_masks(n):
+    """
+    :param n: Board size
+    :return: Bitboards (bit sq is set for every square sq in the row) of the goal rows of both sides
+    """
+    if n not in _goals:
+        row = (1 << n) - 1
+        _goals[n] = (row, row << n*(n-1))  # WHITE needs to get to the top row, BLACK to the bottom row
+    return _goals[n]
+
+
+def path_length(state, side):
+    """
+    Length of the shortest path from the pawn of side to its goal row. Pawns don't block paths.
+    Breadth first search that expands the whole frontier at once with bit operations on the free sides bitboards of the
+    state, and stops as soon as the frontier touches the goal row.
+    :param state: State
+    :param side: 0 (WHITE) or 1 (BLACK)
+    :return: Amount of steps, None if the goal row can't be reached
+    """
+    n = state.n
+    goal = goal_masks(n)[side]
+    left, up, right, down = state.free
+    seen = front = 1 << state.pawns[side]
+    steps = 0
+    while not front & goal:
+        front = (((front & left) >> 1) | ((front & up) >> n) | ((front & right) << 1) | ((front & down) << n)) & ~seen
+        if not front:  # Nothing new to visit and the goal wasn't reached
+            return None
+        seen |= front
+        steps += 1
+    return steps
+
+
+def reachable(state, side):
+    """
+    :return: True if the pawn of side can still get to its goal row
+    """
+    return path_length(state, side) is not None
+
+
+def cut_slots(path, n):
+    """
+    :param path: List of squares, each one next to the one before it
+    :param n: Board size
+    :return: Bitmasks (horizontal, vertical) of the wall slots that would block at least one step of path
+    """
+    cuts = tables(n).cuts
+    hmask = vmask = 0
+    for a, b in zip(path, path[1:]):
+        if b - a == 1 or a - b == 1:  # Step between two columns
+            vmask |= cuts[min(a, b)][1]
+        else:  # Step between two rows
+            hmask |= cuts[min(a, b)][0]
+    return hmask, vmask
+
+
+def bits(mask):
+    """
+    :return: Generator of the indexes of all the set bits in mask, lowest first
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def distance_map(state, side):
+    """
+    Full breadth first search from the goal row of side, one frontier at a time.
+    :return: (dist, layers). dist is a list with the distance from every square to the goal row of side (UNREACHABLE if
+    it can't get there), layers[k] is the bitboard of all squares at distance k
+    """
+    n = state.n
+    left, up, right, down = state.free
+    dist = [UNREACHABLE] * (n*n)
+    layers = []
+    seen = front = goal_masks(n)[side]
+    while front:
+        for sq in bits(front):
+            dist[sq] = len(layers)
+        layers.append(front)
+        front = (((front & left) >> 1) | ((front & up) >> n) | ((front & right) << 1) | ((front & down) << n)) & ~seen
+        seen |= front
+    return dist, layers
+
+
+def update_distances(state, dist, layers, squares):
+    """
+    Updates a distance map in place after walls were added or removed. Layers closer to the goal than the walls can't
+    change, so the search starts again from the first layer a wall touches, and stops as soon as a layer past the walls
+    comes out the same as before with the same squares seen (every layer after it will be the same too). Only squares
+    whose distance changed are written.
+    :param state: State, already with (or without) the walls
+    :param dist: Distance list from distance_map
+    :param layers: Layers from distance_map
+    :param squares: Squares on both sides of every wall that changed
+    """
+    known = [dist[sq] for sq in squares if dist[sq] < UNREACHABLE]
+    if not known:  # The walls are somewhere the goal can't be reached from, nothing changes
+        return
+    low, high = min(known), max(known)
+    n = state.n
+    left, up, right, down = state.free
+    seen = 0
+    for front in layers[:low+1]:
+        seen |= front
+    old_seen = seen
+    front, k = layers[low], low
+    while True:
+        front = (((front & left) >> 1) | ((front & up) >> n) | ((front & right) << 1) | ((front & down) << n)) & ~seen
+        k += 1
+        old = layers[k] if k < len(layers) else 0
+        seen |= front
+        old_seen |= old
+        if front == old and seen == old_seen and k > high:  # Back to the old layers, with the same squares behind
+            return
+        if not front:  # Search is over, squares that were reached before but not now can't reach the goal anymore
+            for old in layers[k:]:
+                old_seen |= old
+            for sq in bits(old_seen & ~seen):
+                dist[sq] = UNREACHABLE
+            del layers[k:]
+            return
+        for sq in bits(front & ~old):
+            dist[sq] = k
+        if k < len(layers):
+            layers[k] = front
+        else:
+            layers.append(front)
+
+
+def shortest_path(state, side):
+    """
+    Walks down the distance map of side from its pawn.
+    :return: List of squares from the pawn of side to its goal row, None if the goal row can't be reached
+    """
+    dist, blocked, neighbours = state.distance_map(side), state.blocked, state.tables.neighbours
+    sq = state.pawns[side]
+    if dist[sq] >= UNREACHABLE:
+        return None
+    path = [sq]
+    while dist[sq]:
+        for d, next_sq in neighbours[sq]:
+            if not blocked[sq] & d and dist[next_sq] == dist[sq]-1:
+                sq = next_sq
+                break
+        path.append(sq)
+    return path
@@ -0,0 +1,246 @@
+import argparse
+import json
+import sys
+from time import perf_counter
+from .state import State, ROWS, wall_move, decode_wall, to_pos, to_square, HORIZONTAL, VERTICAL
+from .tables import LEFT, UP, RIGHT, DOWN
+from .paths import bits
+
+
+def legal_moves(state):
+    """
+    :return: List of every legal move of the side to move: pawn steps, jumps and side-steps, then every legal wall.
+    Empty if the game is over
+    """
+    if state.winner() is not None:
+        return []
+    moves = state.pawn_moves()
+    n = state.n
+    for dir, mask in enumerate(state.legal_walls()):
+        moves.extend(wall_move(slot, dir, n) for slot in bits(mask))
+    return moves
+
+
+def perft(state, depth):
+    """
+    Counts the move sequences of depth plies from state (the leaves of the full game tree). A game that is won on the
+    way isn't played on, so it only counts if it ends exactly at depth. The last ply is only counted, not played.
+    :return: Amount of leaves
+    """
+    if depth == 0:
+        return 1
+    if state.winner() is not None:
+        return 0
+    if depth == 1:
+        hmask, vmask = state.legal_walls()
+        return len(state.pawn_moves()) + bin(hmask).count('1') + bin(vmask).count('1')
+    nodes = 0
+    for move in legal_moves(state):
+        state.push(move)
+        nodes += perft(state, depth - 1)
+        state.pop()
+    return nodes
+
+
+def divide(state, depth, reference=False):
+    """
+    :param reference: Count with reference_moves instead (slow, needs pygame)
+    :return: Dictionary root move -> leaves under it (perft of depth split by the first move)
+    """
+    moves, count = (reference_moves(state), reference_perft) if reference else (legal_moves(state), perft)
+    split = {}
+    for move in moves:
+        child = state.clone()
+        child.play(move)
+        split[move] = count(child, depth - 1)
+    return split
+
+
+class _LegacyView:
+    """
+    Just what Board.possible_moves needs from a Board (size, tile walls and pieces), over a State, so the old tile by
+    tile move generation of the game can be run on any position without a window
+    """
+    def __init__(self, state):
+        self.state = state
+        self.n = state.n
+
+    def tile_walls(self, pos):
+        sq = to_square(pos, self.n)
+        return [self.state.is_blocked(sq, d) for d in (LEFT, UP, RIGHT, DOWN)]
+
+    def get_piece(self, pos):
+        sq = to_square(pos, self.n)
+        return self.state.pawns.index(sq) + 1 if sq in self.state.pawns else 0  # Anything but 0 is a piece
+
+
+def reference_can_place(view, slot, dir):
+    """
+    The wall rules the way the game checked them before the bitboards: the tiles next to the wall can't already have a
+    wall on that side, it can't cross a wall in the same middle point, and a search from tile to tile must still get
+    both pawns to their goal rows. Pawns don't block the way (they can jump), and every tile of the goal row counts.
+    :param view: _LegacyView of the position
+    """
+    n = view.n
+    x, y = slot % (n-1) + 1, slot // (n-1)  # Top point of the vertical wall
+    if dir == VERTICAL:
+        if view.tile_walls((x, y))[0] or view.tile_walls((x, y+1))[0]:  # Overlaps a vertical wall
+            return False
+        if view.state.hwalls >> slot & 1:  # Crosses a horizontal wall
+            return False
+    else:
+        x, y = x-1, y+1  # Left point of the horizontal wall
+        if view.tile_walls((x, y))[1] or view.tile_walls((x+1, y))[1]:  # Overlaps a horizontal wall
+            return False
+        if view.state.vwalls >> slot & 1:
+            return False
+    placed = _LegacyView(view.state.clone())
+    placed.state.add_wall(slot, dir)
+    for side, goal in ((0, 0), (1, n-1)):
+        seen = {to_pos(view.state.pawns[side], n)}
+        todo = list(seen)
+        while todo:
+            tx, ty = todo.pop()
+            if ty == goal:
+                break
+            walls = placed.tile_walls((tx, ty))
+            for blocked, step in zip(walls, ((tx-1, ty), (tx, ty-1), (tx+1, ty), (tx, ty+1))):
+                if not blocked and step not in seen:
+                    seen.add(step)
+                    todo.append(step)
+        else:
+            return False
+    return True
+
+
+def reference_moves(state):
+    """
+    Slow reference of legal_moves, on the game's own move generation: Board.possible_moves (needs pygame) for the pawn,
+    and reference_can_place for every wall slot
+    """
+    from .board import Board
+    if state.winner() is not None:
+        return []
+    view = _LegacyView(state)
+    n = state.n
+    moves = [to_square(pos, n) for pos in Board.possible_moves(view)[to_pos(state.pawns[state.turn], n)]]
+    if state.walls_left[state.turn]:
+        for dir in (HORIZONTAL, VERTICAL):
+            moves.extend(wall_move(slot, dir, n) for slot in range((n-1)*(n-1)) if reference_can_place(view, slot, dir))
+    return moves
+
+
+def reference_perft(state, depth):
+    """
+    perft with reference_moves, playing every move on a copy (no push and pop)
+    """
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in reference_moves(state):
+        child = state.clone()
+        child.play(move)
+        nodes += reference_perft(child, depth - 1)
+    return nodes
+
+
+def check(state, depth):
+    """
+    Compares perft with the reference in every position of the tree up to depth-1 plies deep: the move lists (as sets,
+    the order doesn't matter) and the counts
+    :return: List of differences, as (moves from state, moves only legal_moves found, moves only the reference found).
+    Empty if both agree
+    """
+    differences = []
+
+    def walk(line, depth):
+        fast, slow = set(legal_moves(state)), set(reference_moves(state))
+        if fast != slow:
+            differences.append((list(line), sorted(fast - slow), sorted(slow - fast)))
+        if depth > 1:
+            for move in sorted(fast & slow):
+                state.push(move)
+                walk(line + [move], depth - 1)
+                state.pop()
+
+    walk([], depth)
+    return differences
+
+
+def describe(move, n):
+    """
+    :return: Readable text of move: 'e2' for a pawn move, 'h:e2' / 'v:e2' for a wall on the top left square of its
+    middle point
+    """
+    if move < n*n:
+        x, y = to_pos(move, n)
+        return f'{chr(97 + x)}{n - y}'
+    slot, dir = decode_wall(move, n)
+    x, y = slot % (n-1), slot // (n-1)
+    return f'{"hv"[dir]}:{chr(97 + x)}{n - y}'
+
+
+def run(state, depth):
+    """
+    perft of every depth from 1 to depth
+    :return: List of dictionaries with 'depth', 'nodes', 'seconds' and 'nodes_per_sec'
+    """
+    results = []
+    for d in range(1, depth + 1):
+        start = perf_counter()
+        nodes = perft(state, d)
+        seconds = perf_counter() - start
+        results.append({'depth': d, 'nodes': nodes, 'seconds': round(seconds, 4),
+                        'nodes_per_sec': round(nodes / seconds) if seconds else 0})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Counts every legal move sequence from a position (perft), to check '
+                                                 'the move generation and measure its speed')
+    parser.add_argument('depth', type=int, nargs='?', default=3, help='plies to count (default: 3)')
+    parser.add_argument('--size', type=int, default=ROWS, help='board size')
+    parser.add_argument('--walls', type=int, default=None, help='walls of each player (default: for the board size)')
+    parser.add_argument('--moves', default='', help='comma separated moves (ints) played before counting')
+    parser.add_argument('--divide', action='store_true', help='also count the leaves under every root move')
+    parser.add_argument('--check', type=int, default=0, metavar='DEPTH',
+                        help='compare with the slow reference (needs pygame) to this depth, exit with 1 if not equal')
+    parser.add_argument('--json', action='store_true', help='write the results as JSON')
+    args = parser.parse_args()
+
+    state = State(args.size, args.walls)
+    moves = [int(move) for move in args.moves.split(',') if move]
+    for move in moves:
+        if not state.is_legal(move):
+            parser.error(f'illegal move {move}')
+        state.play(move)
+    results = {'n': state.n, 'moves': moves, 'perft': run(state, args.depth)}
+    if args.divide:
+        results['divide'] = {describe(move, state.n): nodes for move, nodes in divide(state, args.depth).items()}
+    differences = []
+    if args.check:
+        start = perf_counter()
+        differences = check(state, args.check)
+        counts = [reference_perft(state, d) for d in range(1, args.check + 1)]
+        expected = [perft(state, d) for d in range(1, args.check + 1)]
+        results['check'] = {'depth': args.check, 'reference': counts, 'seconds': round(perf_counter() - start, 2),
+                            'ok': not differences and counts == expected}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results['perft']:
+            print(f'perft({result["depth"]}) = {result["nodes"]:>12} {result["seconds"]:>9.3f}s '
+                  f'{result["nodes_per_sec"]:>10} nodes/sec')
+        for move, nodes in results.get('divide', {}).items():
+            print(f'{move:>7} {nodes}')
+        if args.check:
+            print(f'reference: {results["check"]["reference"]} ({"ok" if results["check"]["ok"] else "DIFFERENT"}, '
+                  f'{results["check"]["seconds"]}s)')
+    for line, fast, slow in differences:
+        print(f'after {line}: only legal_moves {fast}, only reference {slow}', file=sys.stderr)
+    if args.check and not results['check']['ok']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
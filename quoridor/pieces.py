@@ -4,16 +4,18 @@ from .constants import *
 
 
 class Pawn:
-    def __init__(self, color, pos):
+    def __init__(self, color, pos, n=ROWS):
         self.color = color
         self.pos = pos  # Pos: (row, column)
+        self.tile_width, self.tile_height = tile_size(n)  # Size of the tiles of the board it's on
+        self.radius = self.tile_width//3  # The diameter of a pawn is 2/3 the width of a tile
         self.x = self.y = 0  # Real location of piece
         self.calc_pos()
 
     def calc_pos(self):
         """x,y will be equal to real x,y position on screen"""
-        self.x = self.pos[0]*TILE_WIDTH + TILE_WIDTH // 2
-        self.y = self.pos[1]*TILE_HEIGHT + TILE_HEIGHT//2 + MARGIN
+        self.x = self.pos[0]*self.tile_width + self.tile_width // 2
+        self.y = self.pos[1]*self.tile_height + self.tile_height//2 + MARGIN
 
     def move(self, new_pos):
         """Move piece from self.pos to new_pos"""
@@ -22,22 +24,33 @@ class Pawn:
 
     def draw(self, win):
         """Draw piece on win"""
-        pygame.gfxdraw.filled_circle(win, self.x, self.y, PAWN_RADIUS, self.color)
+        pygame.gfxdraw.filled_circle(win, self.x, self.y, self.radius, self.color)
+
+    def rect(self):
+        """Rect of the screen that draw paints"""
+        return pygame.Rect(self.x - self.radius - 1, self.y - self.radius - 1, 2*self.radius + 3, 2*self.radius + 3)
+
+    def key(self):
+        """Everything that changes how the pawn looks, equal for two frames if it didn't move"""
+        return 'pawn', self.color, self.x, self.y
 
     def __str__(self):
         return f"Pawn at ({self.pos[0]}, {self.pos[1]})"
 
 
 class Wall:
-    def __init__(self, dir, color):
+    def __init__(self, dir, color, n=ROWS):
         """
         Creates wall
         :param dir: Direction Horizontal-0, Vertical-1
         :param color: Color
+        :param n: Size of the board it's placed on
         """
         self.color = color
         self.pos = []
         self.dir = dir
+        self.tile_width, self.tile_height = tile_size(n)
+        self.length = 2 * self.tile_height  # Each wall is the height of 2 tiles
         self.x1 = self.x2 = self.y1 = self.y2 = 0
         self.placed = False  # Will be true when the wall is placed on the board and can no longer be moved.
         self.lifted = False  # Will be true when the wall is selected (when the player presses space)
@@ -56,17 +69,17 @@ class Wall:
                 self.pos = [first_pos, (first_pos[0], first_pos[1]+2)]
         else:
             if self.dir == 0:  # self.pos will be [(left x, left y), (right x, right y)] (left x == right x)
-                self.pos = [first_pos, (first_pos[0]+WALL_HEIGHT, first_pos[1])]
+                self.pos = [first_pos, (first_pos[0]+self.length, first_pos[1])]
             else:  # self.pos will be [(top x, top y), (bottom x, bottom y)] (top x == bottom x)
-                self.pos = [first_pos, (first_pos[0], first_pos[1]+WALL_HEIGHT)]
+                self.pos = [first_pos, (first_pos[0], first_pos[1]+self.length)]
         self.calc_pos()
 
     def calc_pos(self):
         if self.placed:  # if wall is placed x1,x2,y1,y2 will be the real x,y values of pos
-            self.x1 = self.pos[0][0] * TILE_WIDTH
-            self.x2 = self.pos[1][0] * TILE_WIDTH
-            self.y1 = self.pos[0][1] * TILE_HEIGHT + MARGIN
-            self.y2 = self.pos[1][1] * TILE_HEIGHT + MARGIN
+            self.x1 = self.pos[0][0] * self.tile_width
+            self.x2 = self.pos[1][0] * self.tile_width
+            self.y1 = self.pos[0][1] * self.tile_height + MARGIN
+            self.y2 = self.pos[1][1] * self.tile_height + MARGIN
         else:  # if wall isn't placed, x1,x2,y1,y2 will be equal to pos
             self.x1 = self.pos[0][0]
             self.x2 = self.pos[1][0]
@@ -98,5 +111,14 @@ class Wall:
         """Draw line for wall"""
         pygame.draw.line(win, self.color, (self.x1-1, self.y1-1), (self.x2-1, self.y2-1), WALL_WIDTH+1)
 
+    def rect(self):
+        """Rect of the screen that draw paints (the line with its width around it)"""
+        left, top = min(self.x1, self.x2) - WALL_WIDTH - 2, min(self.y1, self.y2) - WALL_WIDTH - 2
+        return pygame.Rect(left, top, abs(self.x2 - self.x1) + 2*WALL_WIDTH + 4, abs(self.y2 - self.y1) + 2*WALL_WIDTH + 4)
+
+    def key(self):
+        """Everything that changes how the wall looks, equal for two frames if it didn't move"""
+        return 'wall', self.color, self.x1, self.y1, self.x2, self.y2
+
     def __str__(self):
         return f"Wall at {self.pos[0]}, {self.pos[1]}"
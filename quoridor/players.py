@@ -0,0 +1,106 @@
+from random import Random
+from .state import wall_move
+from .paths import bits
+from .search import Search, ordered_moves
+from .mcts import MCTS
+
+
+class RandomPlayer:
+    """
+    Plays a random pawn move, or (with chance wall_chance while it has walls) a random legal wall
+    """
+    def __init__(self, wall_chance=0.3, seed=None):
+        self.wall_chance = wall_chance
+        self.rand = Random(seed)
+
+    def move(self, state):
+        if state.walls_left[state.turn] and self.rand.random() < self.wall_chance:
+            walls = [wall_move(slot, dir, state.n) for dir, mask in enumerate(state.legal_walls()) for slot in bits(mask)]
+            if walls:
+                return self.rand.choice(walls)
+        return self.rand.choice(state.pawn_moves())
+
+
+class GreedyPlayer:
+    """
+    Follows its shortest path. When the opponent is closer to its goal, places the wall that makes the opponent's path
+    longest compared to its own instead (if that helps at all).
+    """
+    def __init__(self, seed=None):
+        self.rand = Random(seed)
+
+    def move(self, state):
+        me, other = state.turn, 1 - state.turn
+        moves = ordered_moves(state)
+        if state.distance(other) < state.distance(me):
+            return moves[0]
+        dist = state.distance_map(me)
+        steps = state.pawn_moves()
+        best = min(dist[sq] for sq in steps)
+        return self.rand.choice([sq for sq in steps if dist[sq] == best])
+
+
+class SearchPlayer:
+    """
+    Alpha-beta search (see search.Search). The search has no randomness, so the seed is ignored: with a node budget
+    the same position always gets the same move. With a time budget the depth reached, and so the move, can change
+    from one run to the next
+    """
+    def __init__(self, budget=0.1, nodes=None, seed=None):
+        """
+        :param seed: Not used, only taken like every player does (see make_player)
+        """
+        self.budget = budget
+        self.nodes = nodes
+        self.search = Search()
+
+    def move(self, state):
+        return self.search.best_move(state, self.budget, self.nodes)
+
+
+class MCTSPlayer:
+    """
+    Monte Carlo tree search (see mcts.MCTS)
+    """
+    def __init__(self, budget=0.1, playouts=None, seed=None):
+        self.budget = budget
+        self.playouts = playouts
+        self.mcts = MCTS(seed=seed)
+
+    def move(self, state):
+        return self.mcts.best_move(state, self.budget, self.playouts)
+
+
+PLAYERS = {'random': RandomPlayer, 'greedy': GreedyPlayer, 'search': SearchPlayer, 'mcts': MCTSPlayer}
+ARGUMENTS = {'random': 'wall_chance', 'search': 'budget', 'mcts': 'budget'}  # Name -> argument given after the colon
+
+
+def parse_spec(spec):
+    """
+    :param spec: Player spec (see make_player)
+    :return: (player class, dictionary of the arguments in spec). Raises ValueError if spec isn't a valid spec
+    """
+    if not isinstance(spec, str):
+        raise ValueError(f'Player spec must be a string, not {spec!r}')
+    name, colon, arg = spec.partition(':')
+    if name not in PLAYERS:
+        raise ValueError(f'Unknown player {name!r}, choose from {", ".join(PLAYERS)}')
+    if not colon:
+        return PLAYERS[name], {}
+    if name not in ARGUMENTS:
+        raise ValueError(f'Player {name!r} takes no argument')
+    try:
+        return PLAYERS[name], {ARGUMENTS[name]: float(arg)}
+    except ValueError:
+        raise ValueError(f'Argument of player {name!r} must be a number, not {arg!r}') from None
+
+
+def make_player(spec, seed=None):
+    """
+    :param spec: Name of the player, optionally followed by a colon and its argument (see ARGUMENTS). For example
+    'random', 'search:0.5' (half a second for every move) or 'mcts:0.2'
+    :param seed: Seed for the player's random generator (players without one, like 'search', ignore it)
+    :return: Player object, its move(state) method returns the move it plays
+    """
+    cls, kwargs = parse_spec(spec)
+    return cls(seed=seed, **kwargs)
@@ -0,0 +1,261 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from .state import State, ROWS, to_pos, to_square
+
+MAGIC = b'QGDB1\n'  # Start of every game database file
+HEADER = struct.Struct('<IBBbBHH')  # Record length, board size, walls, winner (-1 draw), bytes per ply, plies, meta length
+OFFSET = struct.Struct('<Q')  # One entry of the index file: where a record starts in the database file
+STEPS = ((0, -1), (-1, 0), (1, 0), (0, 1), (0, -2), (-2, 0), (2, 0), (0, 2), (-1, -1), (1, -1), (-1, 1), (1, 1))
+# (dx, dy) of the pawn moves: steps, jumps and side-steps. Pawn moves are stored as an index into this, walls after them
+
+
+def encode_move(state, move):
+    """
+    :param state: State before move is played
+    :param move: Move (see state.wall_move)
+    :return: Code of the move: index of the pawn step in STEPS, or len(STEPS) + wall slot and direction
+    """
+    n = state.n
+    if move >= n*n:
+        return len(STEPS) + move - n*n
+    x, y = to_pos(state.pawns[state.turn], n)
+    tx, ty = to_pos(move, n)
+    return STEPS.index((tx - x, ty - y))
+
+
+def decode_move(state, code):
+    """
+    Opposite of encode_move
+    :return: Move
+    """
+    n = state.n
+    if code >= len(STEPS):
+        return n*n + code - len(STEPS)
+    x, y = to_pos(state.pawns[state.turn], n)
+    dx, dy = STEPS[code]
+    return to_square((x + dx, y + dy), n)
+
+
+def ply_width(n):
+    """
+    :return: Bytes needed for the code of one ply on a board of size n (1 up to n=12)
+    """
+    return 1 if len(STEPS) + 2*(n-1)*(n-1) <= 256 else 2
+
+
+def encode_game(moves, winner, n=ROWS, walls=None, meta=None):
+    """
+    :param moves: Moves of the game from the starting position
+    :param winner: 0, 1 or None for a draw
+    :param walls: Walls each player started with, None for the default of the board size (constants.wall_count)
+    :param meta: Dictionary with anything else about the game (players, time...), stored as JSON
+    :return: Bytes of one record: header, metadata and one code per ply
+    """
+    state = State(n, walls)
+    walls = state.walls_left[0]
+    codes = []
+    for move in moves:
+        codes.append(encode_move(state, move))
+        state.play(move)
+    width = ply_width(n)
+    meta = json.dumps(meta, separators=(',', ':')).encode() if meta else b''
+    body = meta + bytes(codes) if width == 1 else meta + struct.pack(f'<{len(codes)}H', *codes)
+    return HEADER.pack(HEADER.size + len(body), n, walls, -1 if winner is None else winner, width, len(codes),
+                       len(meta)) + body
+
+
+class GameWriter:
+    """
+    Appends games to a database file (path) and their offsets to its index file (path + '.idx'). Both files are only
+    ever appended to, so readers that are already open keep working (they see the games there were when they opened).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.data = open(path, 'ab')
+        self.index = open(path + '.idx', 'ab')
+        if self.data.tell() == 0:
+            self.data.write(MAGIC)
+        self.count = self.index.tell() // OFFSET.size  # Games already in the file
+
+    def append(self, moves, winner, n=ROWS, walls=None, meta=None):
+        """
+        Add one game (see encode_game)
+        :return: Number of the game in the file
+        """
+        offset = self.data.tell()
+        self.data.write(encode_game(moves, winner, n, walls, meta))
+        self.data.flush()
+        self.index.write(OFFSET.pack(offset))  # Written after the record, so the index never points past the data
+        self.index.flush()
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class GameReader:
+    """
+    Random access to the games of a database file through memory maps of the file and its index. Nothing is parsed
+    until a game is asked for, and the moves of a game are only decoded when they are replayed. The offsets and two
+    byte codes are read straight from the maps as native ints, so this only runs on little-endian machines (like the
+    files).
+    """
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise RuntimeError(f'Game databases are little-endian and can only be read on little-endian machines, '
+                               f'not on {sys.byteorder}-endian ones')
+        self.path = path
+        if not os.path.exists(path + '.idx'):
+            reindex(path)
+        with open(path + '.idx', 'rb') as file:  # Index first: GameWriter writes a game before its offset, so every
+            size = os.fstat(file.fileno()).st_size  # offset in the index is inside the data mapped after it
+            self.index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.offsets = memoryview(self.index)[:size - size % OFFSET.size].cast('Q')  # Zero copy view of the index
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a game database')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def header(self, i):
+        """
+        :return: Dictionary with the board size, walls, winner (None for a draw), plies and metadata of game i
+        """
+        offset = self.offsets[i]
+        _, n, walls, winner, _, plies, meta_size = HEADER.unpack_from(self.data, offset)
+        start = offset + HEADER.size
+        meta = json.loads(self.data[start:start + meta_size]) if meta_size else {}
+        return {'n': n, 'walls': walls, 'winner': None if winner < 0 else winner, 'plies': plies, 'meta': meta}
+
+    def codes(self, i):
+        """
+        :return: Codes of the plies of game i (see encode_move), a view into the file
+        """
+        offset = self.offsets[i]
+        length, _, _, _, width, plies, meta_size = HEADER.unpack_from(self.data, offset)
+        view = memoryview(self.data)[offset + HEADER.size + meta_size:offset + length]
+        return view if width == 1 else view.cast('H')
+
+    def replay(self, i):
+        """
+        Lazily replays game i. The same State is changed and yielded again after every ply, clone it to keep a position.
+        :return: Generator of (State, move that will be played next or None at the end)
+        """
+        _, n, walls, _, _, _, _ = HEADER.unpack_from(self.data, self.offsets[i])
+        state = State(n, walls)
+        for code in self.codes(i):
+            move = decode_move(state, code)
+            yield state, move
+            state.play(move)
+        yield state, None
+
+    def moves(self, i):
+        """
+        :return: List of the moves of game i
+        """
+        return [move for _, move in self.replay(i)][:-1]
+
+    def __iter__(self):
+        """
+        Headers of all the games, in the order they were written
+        """
+        return (self.header(i) for i in range(len(self)))
+
+    def close(self):
+        self.offsets.release()
+        if isinstance(self.index, mmap.mmap):
+            self.index.close()
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def reindex(path):
+    """
+    Writes the index file of a database again by walking through its records (if it was lost or is behind the data)
+    :return: Amount of games
+    """
+    offsets = []
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size:  # An empty file can't be mapped
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:  # Only the headers are read from it
+                offset = len(MAGIC)
+                while offset + HEADER.size <= len(data):
+                    length = HEADER.unpack_from(data, offset)[0]
+                    if offset + length > len(data):  # Half written record at the end
+                        break
+                    offsets.append(offset)
+                    offset += length
+    with open(path + '.idx', 'wb') as file:
+        file.write(b''.join(OFFSET.pack(offset) for offset in offsets))
+    return len(offsets)
+
+
+def read_games(path):
+    """
+    :param path: File written by quoridor.selfplay --out: JSON lines, or a .qgdb game database (see GameWriter)
+    :return: Generator of games: dictionaries with 'game' (number or id), 'n', 'walls' (None if not recorded), 'moves'.
+    Only one game is read at a time
+    """
+    if path.endswith('.qgdb'):
+        with GameReader(path) as reader:
+            for i in range(len(reader)):
+                header = reader.header(i)
+                yield {'game': i, 'n': header['n'], 'walls': header['walls'], 'moves': reader.moves(i)}
+    else:
+        with open(path) as file:
+            for i, line in enumerate(file):
+                if line.strip():
+                    game = json.loads(line)
+                    yield {'game': game.get('game', i), 'n': game['n'], 'walls': game.get('walls'),
+                           'moves': game['moves']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summary of a game database, or conversion from selfplay JSON lines')
+    parser.add_argument('path', help='game database file')
+    parser.add_argument('--from-json', default=None, help='append the games of a selfplay JSON lines file first')
+    parser.add_argument('--show', type=int, default=None, help='print the moves of this game')
+    args = parser.parse_args()
+
+    if args.from_json:
+        with open(args.from_json) as file, GameWriter(args.path) as writer:
+            for line in file:
+                if line.strip():
+                    game = json.loads(line)
+                    writer.append(game['moves'], game['winner'], game['n'],
+                                  meta={key: game[key] for key in ('white', 'black', 'seconds') if key in game})
+    with GameReader(args.path) as reader:
+        wins, plies = [0, 0, 0], 0  # White, black, draws
+        for header in reader:
+            wins[2 if header['winner'] is None else header['winner']] += 1
+            plies += header['plies']
+        size = os.path.getsize(args.path)
+        print(f'{len(reader)} games, {plies} plies, {size} bytes ({size / max(1, len(reader)):.1f} bytes/game). '
+              f'White {wins[0]}, black {wins[1]}, draws {wins[2]}')
+        if args.show is not None:
+            print(reader.header(args.show))
+            print(reader.moves(args.show))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+from functools import lru_cache
+import pygame
+
+
+class Renderer:
+    """
+    Draws frames on the window only where something changed since the last frame. The board without its pieces is drawn
+    once on an off-screen surface and copied back wherever something was drawn before. Everything else is an item:
+    (key, rect, draw function). The key is equal between two frames if nothing about the item changed, so only items
+    that appeared or disappeared (moved items are both) make the screen dirty.
+    """
+    def __init__(self, win, draw_background):
+        """
+        :param win: Window
+        :param draw_background: Function that draws the static part of the frame on the surface it is given
+        """
+        self.win = win
+        self.draw_background = draw_background
+        self.background = None  # Made on the first frame
+        self.items = {}  # key -> rect of the items on the screen
+
+    def draw(self, items):
+        """
+        Draw a frame and update the dirty parts of the display
+        :param items: List of (key, rect, draw function taking the window), drawn in this order
+        :return: List of the rects that were updated
+        """
+        if self.background is None:
+            self.background = pygame.Surface(self.win.get_size())
+            self.draw_background(self.background)
+            self.items = {}
+            dirty = [self.win.get_rect()]
+        else:
+            keys = {key for key, _, _ in items}
+            dirty = [rect for key, rect in self.items.items() if key not in keys]  # Gone, or moved away from there
+            dirty += [rect for key, rect, _ in items if key not in self.items]  # New, or moved there
+        for area in dirty:
+            self.win.set_clip(area)
+            self.win.blit(self.background, area, area)
+            for _, rect, draw in items:
+                if rect.colliderect(area):
+                    draw(self.win)
+        self.win.set_clip(None)
+        self.items = {key: rect for key, rect, _ in items}
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+    def invalidate(self):
+        """
+        Draw everything again on the next frame (after the window lost what was drawn on it, see Game.redraw)
+        """
+        self.background = None
+
+
+@lru_cache(maxsize=64)
+def text(string, font, color, background=None):
+    """
+    Rendered text, cached: the same text in the same font and colors is only rasterized once (least recently used
+    surfaces are dropped after 64). The surface is shared, so it must not be drawn on.
+    :return: Surface with the text
+    """
+    return font.render(string, True, color, background)
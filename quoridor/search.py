@@ -0,0 +1,262 @@
+from time import perf_counter
+from .state import wall_move
+from .paths import bits, cut_slots, shortest_path
+from . import endgame
+from .stats import STATS
+
+WIN = 100000  # Score of a won position. Wins found deeper in the search score a little less (WIN - plies)
+EXACT, LOWER, UPPER = 0, 1, 2  # Kinds of scores kept in the transposition table
+
+
+def evaluate(state):
+    """
+    Static evaluation of a position
+    :param state: State
+    :return: Score from the point of view of the side to move (positive is good for the side to move)
+    """
+    me, other = state.turn, 1 - state.turn
+    if state.winner() is not None:  # The side that just moved won
+        return -WIN
+    mine, theirs = state.distance(me), state.distance(other)
+    walls = state.walls_left[me] - state.walls_left[other]
+    return 10*(theirs - mine) + 3*walls + 5  # Being on move is worth half a step
+
+
+def ordered_moves(state, first=None):
+    """
+    Moves of the side to move, ordered by how much they change the goal distances: pawn moves by how much closer they
+    get, walls by how much longer they make the opponent's path compared to ours. Only walls that block the opponent's
+    current shortest path are included.
+    :param state: State
+    :param first: Move to put first (best move from the transposition table)
+    :return: List of legal moves of the side to move, best looking first
+    """
+    me, other = state.turn, 1 - state.turn
+    n = state.n
+    dist = state.distance_map(me)
+    mine, theirs = dist[state.pawns[me]], state.distance(other)
+    scored = [(mine - dist[sq], sq) for sq in state.pawn_moves()]  # How many steps closer the pawn gets
+    if state.walls_left[me]:
+        hcut, vcut = cut_slots(shortest_path(state, other), n)
+        hmine, vmine = cut_slots(shortest_path(state, me), n)  # Only these walls can make our own path longer
+        hfree, vfree = state.free_slots()
+        for dir, mask, own in ((0, hcut & hfree, hmine), (1, vcut & vfree, vmine)):
+            for slot in bits(mask):
+                if own >> slot & 1:
+                    new_theirs, new_mine = state.path_lengths_with(slot, dir, (other, me))
+                else:
+                    new_theirs, new_mine = state.path_lengths_with(slot, dir, (other,))[0], mine
+                if new_theirs is not None and new_mine is not None:  # Wall is legal
+                    scored.append(((new_theirs - theirs) - (new_mine - mine), wall_move(slot, dir, n)))
+    scored.sort(reverse=True)
+    moves = [move for _, move in scored]
+    if first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+    return moves
+
+
+def known_move(state, book=None):
+    """
+    Move that needs no search: from the opening book, or from the endgame solver when nobody has walls left
+    :param book: book.Book, None for no book
+    :return: (move, score or None if it isn't known), None if the position has to be searched
+    """
+    if book is not None:
+        move = book.get(state)
+        if move is not None:
+            return move, None
+    if endgame.solvable(state):
+        result, plies, move = endgame.solve(state)
+        if move is not None:
+            return move, result * (WIN - plies)  # 0 for a draw
+    return None
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of search results, indexed by the low bits of State.key. When two positions want the same
+    entry, the new one replaces the old one if it was searched at least as deep, or if the old one is left over from an
+    earlier search.
+    """
+    def __init__(self, size=1 << 18):
+        """
+        :param size: Amount of entries, must be a power of 2
+        """
+        self.size = size
+        self.keys = [0] * size
+        self.entries = [None] * size  # (depth, score, kind, move, age)
+        self.age = 0  # Incremented for every new search
+        self.probes = self.hits = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def get(self, key):
+        """
+        :return: (depth, score, kind, move, age) stored for key, None if key isn't in the table
+        """
+        self.probes += 1
+        i = key & (self.size-1)
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.entries[i]
+        return None
+
+    def put(self, key, depth, score, kind, move):
+        i = key & (self.size-1)
+        old = self.entries[i]
+        if old is None or self.keys[i] == key or old[4] != self.age or depth >= old[0]:
+            self.keys[i] = key
+            self.entries[i] = (depth, score, kind, move, self.age)
+
+    def clear(self):
+        self.keys = [0] * self.size
+        self.entries = [None] * self.size
+
+
+class OutOfBudget(Exception):
+    """
+    Raised inside the search when the time or node budget runs out
+    """
+    pass
+
+
+class Search:
+    """
+    Iterative deepening alpha-beta search (negamax) with a transposition table, over the moves of ordered_moves.
+    Positions in the opening book and races without walls are answered without searching (see known_move).
+    With a cache (cache.Cache), results of earlier runs that went deeper are used instead, and results are saved to it.
+    """
+    def __init__(self, table=None, book=None, cache=None):
+        self.table = table if table is not None else TranspositionTable()
+        self.book = book  # Opening book (book.Book), None for no book
+        self.cache = cache  # Results kept on disk between runs (cache.Cache), None for no cache
+        self.nodes = 0  # Nodes searched by the last call to best_move
+        self.depth = 0  # Depth of the last finished iteration
+        self.score = 0  # Score of the best move at that depth
+        self.time = 0  # Seconds the last search took
+        self.probes = self.hits = 0  # Transposition table lookups of the last search, and how many found their position
+        self.deadline = self.max_nodes = None
+        self.root_move = None  # Best move found so far at the root of the search
+
+    def best_move(self, state, budget=1.0, nodes=None, max_depth=64, first_depth=1):
+        """
+        Search state deeper and deeper until the budget runs out. state is changed during the search but is left the way
+        it was.
+        :param state: State
+        :param budget: Seconds to think, None for no time limit
+        :param nodes: Maximum amount of nodes, None for no limit
+        :param max_depth: Don't search deeper than this
+        :param first_depth: Depth of the first iteration
+        :return: Best move found, None if the game is over
+        """
+        start = perf_counter()
+        self.deadline = None if budget is None else start + budget
+        self.max_nodes = nodes
+        self.nodes = self.depth = self.score = 0
+        self.table.new_search()
+        if state.winner() is not None:
+            return None
+        probes, hits = self.table.probes, self.table.hits
+        known = known_move(state, self.book)
+        if known is not None:
+            self.root_move, score = known
+            self.score = score if score is not None else 0
+            self.finish(start, probes, hits)
+            return self.root_move
+        cached = self.cache.get(state) if self.cache is not None else None
+        if cached is not None:
+            if cached['depth'] >= max_depth or abs(cached['score']) >= WIN - 64:  # Deep enough, or a forced result
+                self.root_move, self.score, self.depth = cached['move'], cached['score'], cached['depth']
+                self.finish(start, probes, hits)
+                return self.root_move
+            self.table.put(state.key, 0, 0, UPPER, cached['move'])  # Only gives the move to try first
+        self.root_move = None
+        try:
+            for depth in range(first_depth, max_depth+1):
+                self.score = self.search(state, depth, -WIN-1, WIN+1, 0)
+                self.depth = depth
+                if abs(self.score) >= WIN - max_depth:  # Forced win or loss found, going deeper won't change it
+                    break
+        except OutOfBudget:  # The root move of an unfinished iteration is only replaced if it was beaten, so it's kept
+            pass
+        if self.root_move is None:  # Not even one move was searched
+            self.root_move = ordered_moves(state)[0]
+        if cached is not None and cached['depth'] > self.depth:  # An earlier run saw further
+            self.root_move, self.score, self.depth = cached['move'], cached['score'], cached['depth']
+        elif self.cache is not None and self.depth:
+            self.cache.put(state, self.root_move, self.score, self.depth)
+        self.finish(start, probes, hits)
+        return self.root_move
+
+    def finish(self, start, probes, hits):
+        """
+        Keep the time and the table lookups of the search that just ended, and record it if stats.STATS is enabled
+        """
+        self.time = perf_counter() - start
+        self.probes, self.hits = self.table.probes - probes, self.table.hits - hits
+        if STATS.enabled:
+            STATS.record_search(self.info())
+
+    def info(self):
+        """
+        :return: Statistics of the last search: nodes, depth, score, seconds, table lookups and their hit rate
+        """
+        return {'nodes': self.nodes, 'depth': self.depth, 'score': self.score, 'time': round(self.time, 4),
+                'nodes_per_sec': round(self.nodes / self.time) if self.time else 0, 'tt_probes': self.probes,
+                'tt_hit_rate': round(self.hits / self.probes, 3) if self.probes else 0.0}
+
+    def search(self, state, depth, alpha, beta, ply):
+        """
+        :return: Score of state from the point of view of the side to move
+        """
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            self.check_budget()
+        if state.winner() is not None:
+            return -WIN + ply  # The side that just moved won
+        if depth == 0:
+            return evaluate(state)
+        key, start_alpha = state.key, alpha
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_depth, score, kind, tt_move, _ = entry
+            if tt_depth >= depth and ply > 0:
+                score = score - ply if score > WIN//2 else score + ply if score < -WIN//2 else score
+                if kind == EXACT or (kind == LOWER and score >= beta) or (kind == UPPER and score <= alpha):
+                    return score
+        best, best_move = -WIN-1, None
+        for move in ordered_moves(state, tt_move):
+            state.push(move)
+            try:
+                score = -self.search(state, depth-1, -beta, -alpha, ply+1)
+            finally:  # Leave the state the way it was, even if the budget runs out
+                state.pop()
+            if score > best:
+                best, best_move = score, move
+                if ply == 0:
+                    self.root_move = move
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+        if best_move is None:  # No legal moves (the pawn is boxed in)
+            return evaluate(state)
+        kind = UPPER if best <= start_alpha else LOWER if best >= beta else EXACT
+        stored = best + ply if best > WIN//2 else best - ply if best < -WIN//2 else best  # Wins counted from here
+        self.table.put(key, depth, stored, kind, best_move)
+        return best
+
+    def check_budget(self):
+        if (self.deadline is not None and perf_counter() > self.deadline) or \
+                (self.max_nodes is not None and self.nodes >= self.max_nodes):
+            raise OutOfBudget()
+
+
+def best_move(state, budget=1.0, nodes=None):
+    """
+    Shortcut for a one off search with a new transposition table
+    :return: Best move for the side to move in state
+    """
+    return Search().best_move(state, budget, nodes)
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import sys
+from multiprocessing import Pool
+from time import perf_counter
+from .state import State, ROWS
+from .players import make_player, parse_spec
+from .records import GameWriter
+from .cache import Cache
+
+
+def play_game(white, black, n=ROWS, max_plies=400):
+    """
+    Play one game without any graphics
+    :param white: Player of WHITE (object with a move(state) method)
+    :param black: Player of BLACK
+    :param n: Board size
+    :param max_plies: The game is a draw if nobody wins after this many plies
+    :return: (winner, moves). winner is 0 (WHITE), 1 (BLACK) or None for a draw
+    """
+    state = State(n)
+    players = (white, black)
+    moves = []
+    while state.winner() is None and len(moves) < max_plies:
+        move = players[state.turn].move(state)
+        state.play(move)
+        moves.append(move)
+    return state.winner(), moves
+
+
+def _play(job):
+    """
+    Runs in a worker process
+    :param job: (game number, white spec, black spec, board size, max plies, seed, cache path or None)
+    :return: Dictionary with the result of the game
+    """
+    number, white, black, n, max_plies, seed, cache_path = job
+    start = perf_counter()
+    players = make_player(white, seed), make_player(black, seed + 1)
+    cache = Cache(cache_path) if cache_path else None
+    for player in players:
+        if hasattr(player, 'search'):  # Alpha-beta players use and fill the cache
+            player.search.cache = cache
+    try:
+        winner, moves = play_game(*players, n, max_plies)
+    finally:
+        if cache is not None:
+            cache.close()
+    return {'game': number, 'white': white, 'black': black, 'n': n, 'winner': winner, 'plies': len(moves),
+            'moves': moves, 'seconds': round(perf_counter() - start, 4)}
+
+
+def run(games, white='random', black='random', n=ROWS, max_plies=400, workers=None, seed=0, out=None, cache=None):
+    """
+    Play many games over a pool of worker processes. Results come back (and are written) in the order the games finish.
+    :param games: Amount of games
+    :param white: Player spec of WHITE (see players.make_player)
+    :param black: Player spec of BLACK
+    :param workers: Amount of worker processes, os.cpu_count() if None
+    :param seed: Game i uses seeds seed + 2*i and seed + 2*i + 1 for its players (search players have no randomness)
+    :param out: File object to write one line of JSON to for each game, None to not write anything
+    :param cache: Path of a cache.Cache the search players share between games and runs, None for no cache
+    :return: Generator of result dictionaries
+    """
+    jobs = ((i, white, black, n, max_plies, seed + 2*i, cache) for i in range(games))
+    chunk = max(1, min(16, games // (4 * (workers or os.cpu_count() or 1))))  # Fewer round trips for short games
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(_play, jobs, chunk):
+            if out is not None:
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+            yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless self-play. Writes one JSON line per game')
+    parser.add_argument('games', type=int, help='amount of games')
+    parser.add_argument('--white', default='random', help="player of white: random, greedy, search[:seconds], "
+                                                          "mcts[:seconds]")
+    parser.add_argument('--black', default='random', help='player of black')
+    parser.add_argument('--size', type=int, default=ROWS, help='board size')
+    parser.add_argument('--max-plies', type=int, default=400, help='games longer than this are draws')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='-', help='file to write the games to (default: standard output). Files ending '
+                                                   'in .qgdb are written as a binary game database (see records)')
+    parser.add_argument('--cache', default=None, help='sqlite file of search results kept between runs (see '
+                                                      'quoridor.cache)')
+    args = parser.parse_args()
+    for spec in (args.white, args.black):  # Checked before the pool starts, the workers would only fail in a game
+        try:
+            parse_spec(spec)
+        except ValueError as error:
+            parser.error(str(error))
+
+    database = args.out.endswith('.qgdb')
+    out = GameWriter(args.out) if database else sys.stdout if args.out == '-' else open(args.out, 'a')
+    wins = [0, 0, 0]  # White, black, draws
+    start = perf_counter()
+    try:
+        for result in run(args.games, args.white, args.black, args.size, args.max_plies, args.workers, args.seed,
+                          None if database else out, args.cache):
+            wins[2 if result['winner'] is None else result['winner']] += 1
+            if database:
+                out.append(result['moves'], result['winner'], result['n'],
+                           meta={key: result[key] for key in ('game', 'white', 'black', 'seconds')})
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = perf_counter() - start
+    print(f'{args.games} games in {seconds:.1f}s ({args.games / seconds:.2f} games/sec). '
+          f'White {wins[0]}, black {wins[1]}, draws {wins[2]}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from time import perf_counter
+from .state import State, ROWS, wall_move
+from .paths import bits
+from .players import make_player, parse_spec
+
+RTT_TARGET = 0.05  # Seconds. Move round trips (move sent -> its delta received) should stay under this at the 99th percentile
+GAMES_PER_CORE_TARGET = 200  # Concurrent games one core should host while staying under RTT_TARGET
+MIN_SIZE, MAX_SIZE = 3, 19  # Board sizes the server hosts. The tables of a new size are made in the event loop
+PLAYERS_KEPT = 256  # AI players an AI worker keeps, the ones not used for the longest time are dropped first
+_players = {}  # Players of the current AI worker process, by (game, spec) (they keep their tables between moves)
+
+
+def encode(message):
+    """
+    :return: Bytes of one message on the wire: compact JSON on its own line
+    """
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def _ai_move(game, spec, state, seed):
+    """
+    Runs in an AI worker process. Every game gets its own player, made from the game's seed the first time the worker
+    moves in it, so games don't share random numbers or tables. Once the worker has PLAYERS_KEPT players, the one not
+    used for the longest time (usually of a finished game) is dropped
+    :param game: Game number
+    :param state: Copy of the game's position
+    :param seed: Seed of the game
+    :return: Move of the player spec
+    """
+    key = (game, spec)
+    player = _players.pop(key, None)
+    if player is None:
+        player = make_player(spec, seed)
+        if len(_players) >= PLAYERS_KEPT:
+            del _players[next(iter(_players))]  # Used the longest time ago
+    _players[key] = player  # Last used goes to the end
+    return player.move(state)
+
+
+class Match:
+    """
+    One game hosted by the server
+    """
+    def __init__(self, number, n, ai, seed=0):
+        """
+        :param seed: Seed of the AI players of the game
+        """
+        self.number = number
+        self.seed = seed
+        self.state = State(n)
+        self.moves = []
+        self.seats = [None, None]  # Connection (StreamWriter) of each side, None while nobody sits there
+        self.ai = ai  # [spec or None, spec or None]: player spec of the sides the server plays itself
+
+    def delta(self, move):
+        """
+        :return: Message telling both sides that move was played: everything that changed, not the whole board
+        """
+        state = self.state
+        return {'op': 'moved', 'game': self.number, 'ply': len(self.moves), 'move': move, 'turn': state.turn,
+                'walls_left': state.walls_left, 'winner': state.winner()}
+
+
+class Server:
+    """
+    Hosts many games at once in one asyncio event loop. Messages are JSON lines (see encode). Requests:
+    {'op': 'new', 'n': size, 'side': 0 or 1, 'opponent': player spec or None} starts a game, against the AI if opponent
+    is given, and is answered with {'op': 'started', 'game': number, 'side': side, 'n': size}.
+    {'op': 'join', 'game': number} takes the free side of a game without an AI opponent ('joined' goes to both sides).
+    {'op': 'move', 'game': number, 'move': move} plays a move (see state.wall_move), both sides get its delta
+    {'op': 'moved', ...} (see Match.delta). Illegal requests are answered with {'op': 'error', 'reason': text}.
+    When a player disconnects, the other side gets {'op': 'abandoned', 'game': number} and the game is over. If the AI
+    fails to move, its opponent gets an error with the game number and the game is over too.
+    {'op': 'ping', 't': anything} is answered with {'op': 'pong', 't': the same}.
+    The AI players think in a process pool so that the loop keeps serving the other games meanwhile.
+    """
+    def __init__(self, workers=1, seed=0):
+        """
+        :param workers: AI worker processes
+        """
+        self.pool = ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'))
+        # Spawned, not forked: forked workers would keep copies of the open sockets, and closed connections would stay open
+        self.rand = Random(seed)
+        self.matches = {}
+        self.count = 0  # Games started
+        self.finished = 0
+        self.moves = 0
+        self.connections = 0  # Open connections
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        :param port: Port to listen on, 0 for any free port
+        :return: Port the server listens on
+        """
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection until it closes
+        """
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    self.dispatch(message, writer)
+                except (ValueError, KeyError, TypeError) as error:
+                    writer.write(encode({'op': 'error', 'reason': str(error)}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for match in list(self.matches.values()):  # Games of the connection are over
+                if writer in match.seats:
+                    del self.matches[match.number]
+                    for seat in match.seats:
+                        if seat is not None and seat is not writer:
+                            seat.write(encode({'op': 'abandoned', 'game': match.number}))
+            writer.close()
+            self.connections -= 1
+
+    def dispatch(self, message, writer):
+        op = message['op']
+        if op == 'ping':
+            writer.write(encode({'op': 'pong', 't': message.get('t')}))
+        elif op == 'new':
+            side, n, opponent = message.get('side', 0), message.get('n', ROWS), message.get('opponent')
+            if side not in (0, 1):
+                raise ValueError(f'side must be 0 or 1, not {side!r}')
+            if not isinstance(n, int) or not MIN_SIZE <= n <= MAX_SIZE:
+                raise ValueError(f'board size must be from {MIN_SIZE} to {MAX_SIZE}, not {n!r}')
+            if opponent is not None:
+                parse_spec(opponent)  # Raises ValueError for specs the AI workers couldn't play
+            match = Match(self.count, n, [None, None], self.rand.getrandbits(32))
+            self.count += 1
+            match.seats[side] = writer
+            match.ai[1 - side] = opponent
+            self.matches[match.number] = match
+            writer.write(encode({'op': 'started', 'game': match.number, 'side': side, 'n': match.state.n}))
+            self.next_turn(match)
+        elif op == 'join':
+            match = self.matches[message['game']]
+            if None not in match.seats or any(match.ai):
+                raise ValueError('game is full')
+            side = match.seats.index(None)
+            match.seats[side] = writer
+            for seat in match.seats:
+                seat.write(encode({'op': 'joined', 'game': match.number, 'side': side, 'n': match.state.n}))
+        elif op == 'move':
+            match = self.matches.get(message['game'])
+            move = message['move']
+            if match is None or match.seats[match.state.turn] is not writer:
+                raise ValueError('not your turn')
+            if not isinstance(move, int) or not match.state.is_legal(move):
+                raise ValueError(f'illegal move {move}')
+            self.play(match, move)
+        else:
+            raise ValueError(f'unknown op {op}')
+
+    def play(self, match, move):
+        """
+        Play move in match, send its delta to both sides and let the AI move if it's its turn
+        """
+        match.state.play(move)
+        match.moves.append(move)
+        self.moves += 1
+        data = encode(match.delta(move))
+        for seat in match.seats:
+            if seat is not None:
+                seat.write(data)
+        if match.state.winner() is not None:
+            self.finished += 1
+            del self.matches[match.number]
+        else:
+            self.next_turn(match)
+
+    def next_turn(self, match):
+        spec = match.ai[match.state.turn]
+        if spec is not None and match.state.winner() is None:
+            asyncio.ensure_future(self.ai_turn(match, spec))
+
+    async def ai_turn(self, match, spec):
+        """
+        Let the AI pick a move in the process pool, and play it if the game is still on. If the AI fails, the game is
+        over and its opponent gets an error
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            move = await loop.run_in_executor(self.pool, _ai_move, match.number, spec, match.state.clone(), match.seed)
+        except Exception as error:  # Error in the player, or the pool is broken
+            if self.matches.pop(match.number, None) is not None:
+                for seat in match.seats:
+                    if seat is not None:
+                        seat.write(encode({'op': 'error', 'game': match.number, 'reason': f'AI failed: {error!r}'}))
+                        await seat.drain()
+            return
+        if match.number in self.matches:
+            self.play(match, move)
+            for seat in match.seats:
+                if seat is not None:
+                    await seat.drain()
+
+
+class Client:
+    """
+    Local stand-in for a network client: keeps its own State up to date from the deltas it receives
+    """
+    def __init__(self):
+        self.reader = self.writer = None
+        self.state = None
+        self.game = self.side = None
+
+    async def connect(self, host='127.0.0.1', port=0):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def send(self, message):
+        self.writer.write(encode(message))
+        await self.writer.drain()
+
+    async def receive(self):
+        """
+        :return: Next message from the server. Deltas are played on the client's state before they are returned
+        """
+        message = json.loads(await self.reader.readline())
+        if message['op'] == 'moved' and message['game'] == self.game:
+            self.state.play(message['move'])
+        elif message['op'] in ('started', 'joined') and self.game is None:
+            self.game, self.side, self.state = message['game'], message['side'], State(message['n'])
+        return message
+
+    async def new_game(self, n=ROWS, side=0, opponent=None):
+        self.game = None
+        await self.send({'op': 'new', 'n': n, 'side': side, 'opponent': opponent})
+        return await self.receive()
+
+    async def move(self, move):
+        await self.send({'op': 'move', 'game': self.game, 'move': move})
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def _play_games(port, games, opponent, rand, rtts):
+    """
+    One client playing games one after another against the server's AI, with random legal moves
+    :param rtts: List the round trip times of the client's moves are added to
+    """
+    client = Client()
+    await client.connect(port=port)
+    try:
+        for _ in range(games):
+            message = await client.new_game(opponent=opponent)
+            if message['op'] == 'error':
+                raise RuntimeError(message['reason'])
+            while client.state.winner() is None:
+                if client.state.turn != client.side:
+                    message = await client.receive()  # AI move
+                    if message['op'] == 'error':
+                        raise RuntimeError(message['reason'])
+                    continue
+                state, walls = client.state, []
+                if rand.random() < 0.2:
+                    walls = [wall_move(slot, dir, state.n) for dir, mask in enumerate(state.legal_walls())
+                             for slot in bits(mask)]
+                move = rand.choice(walls) if walls else rand.choice(state.pawn_moves())
+                start = perf_counter()
+                await client.move(move)
+                message = await client.receive()
+                if message['op'] == 'error':
+                    raise RuntimeError(message['reason'])
+                rtts.append(perf_counter() - start)
+    finally:
+        await client.close()  # Also after an error, so that the server sees the connection go
+
+
+async def load_test(clients=100, games=2, opponent='random', workers=1):
+    """
+    Hosts clients concurrent games (each client plays games in a row) in a server in this process. The clients run in
+    the same process, so they take part of the time the server would have on its own
+    :return: Dictionary of metrics. 'errors' has the errors of the clients that failed. Without a single move round
+    trip to measure, the rtt metrics are None and the targets aren't met
+    """
+    server = Server(workers)
+    port = await server.start()
+    rand = Random(0)
+    rtts = []
+    start = perf_counter()
+    results = await asyncio.gather(*(_play_games(port, games, opponent, Random(rand.random()), rtts)
+                                     for _ in range(clients)), return_exceptions=True)
+    seconds = perf_counter() - start
+    while server.connections:  # Let the server see the clients go
+        await asyncio.sleep(0.01)
+    server.close()
+    rtts.sort()
+    cores = min(os.cpu_count() or 1, 1 + workers)  # Event loop and AI workers
+    p50 = round(rtts[len(rtts) // 2] * 1000, 2) if rtts else None
+    p99 = round(rtts[int(len(rtts) * 0.99)] * 1000, 2) if rtts else None
+    errors = [repr(result) for result in results if isinstance(result, BaseException)]
+    return {'concurrent_games': clients, 'games': server.finished, 'moves': server.moves, 'seconds': round(seconds, 2),
+            'games_per_sec': round(server.finished / seconds, 1) if seconds else 0,
+            'moves_per_sec': round(server.moves / seconds) if seconds else 0,
+            'concurrent_games_per_core': round(clients / cores, 1), 'rtt_p50_ms': p50, 'rtt_p99_ms': p99,
+            'errors': errors, 'meets_targets': p99 is not None and not errors and p99 <= RTT_TARGET * 1000 and
+            clients / cores >= GAMES_PER_CORE_TARGET}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Game server. With --load, a load test against local clients')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help='AI worker processes')
+    parser.add_argument('--load', type=int, default=None, help='run a load test with this many concurrent clients')
+    parser.add_argument('--games', type=int, default=2, help='games for every client of the load test')
+    parser.add_argument('--opponent', default='random', help='AI player of the load test games')
+    args = parser.parse_args()
+
+    if args.load:
+        metrics = asyncio.run(load_test(args.load, args.games, args.opponent, args.workers))
+        print(json.dumps(metrics, indent=2))
+        if metrics['errors'] or metrics['rtt_p99_ms'] is None:
+            print(f'load test failed: {len(metrics["errors"])} of {args.load} clients failed'
+                  f'{", no move round trip measured" if metrics["rtt_p99_ms"] is None else ""}', file=sys.stderr)
+            sys.exit(1)
+        return
+
+    async def serve():
+        server = Server(args.workers)
+        port = await server.start(args.host, args.port)
+        print(f'Serving on {args.host}:{port}', file=sys.stderr)
+        try:
+            await server.server.serve_forever()
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
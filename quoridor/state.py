@@ -0,0 +1,395 @@
+from random import Random
+from .paths import reachable, path_length, shortest_path, cut_slots, bits, distance_map, update_distances
+from .tables import tables, HORIZONTAL, VERTICAL, LEFT, UP, RIGHT, DOWN
+from .constants import ROWS, wall_count
+
+_zobrist = {}  # Board size -> random keys used for State.key
+
+
+def to_square(pos, n=ROWS):
+    """
+    :param pos: (x, y) position on board (x is the column, y is the row)
+    :param n: Board size
+    :return: Index of the square (y*n + x)
+    """
+    return pos[1]*n + pos[0]
+
+
+def to_pos(sq, n=ROWS):
+    """
+    :param sq: Index of square
+    :param n: Board size
+    :return: (x, y) position of the square
+    """
+    return sq % n, sq // n
+
+
+def wall_slot(pos, dir, n=ROWS):
+    """
+    Converts the position Board and Wall use for walls (top point of a vertical wall, left point of a horizontal wall)
+    to a slot index. A slot is the grid point in the middle of the wall: point (cx, cy) with 1 <= cx, cy <= n-1 is slot
+    (cy-1)*(n-1) + cx-1, so a vertical and a horizontal wall in the same slot cross each other.
+    :param pos: (x, y) position of wall
+    :param dir: HORIZONTAL or VERTICAL
+    :param n: Board size
+    :return: Slot index, None if the wall doesn't fit on the board
+    """
+    x, y = pos
+    cx, cy = (x, y+1) if dir == VERTICAL else (x+1, y)
+    if 0 < cx < n and 0 < cy < n:
+        return (cy-1)*(n-1) + cx-1
+    return None
+
+
+def slot_pos(slot, dir, n=ROWS):
+    """
+    Opposite of wall_slot
+    :return: (x, y) position of the wall the way Board and Wall use it
+    """
+    cx, cy = slot % (n-1) + 1, slot // (n-1) + 1
+    return (cx, cy-1) if dir == VERTICAL else (cx-1, cy)
+
+
+def wall_move(slot, dir, n=ROWS):
+    """
+    Moves are single ints: squares 0..n*n-1 are pawn moves, after them come all horizontal wall slots and then all
+    vertical wall slots.
+    :return: Move that places a wall of direction dir in slot
+    """
+    return n*n + dir*(n-1)*(n-1) + slot
+
+
+def decode_wall(move, n=ROWS):
+    """
+    :param move: Wall move (move >= n*n)
+    :return: (slot, dir) of the wall
+    """
+    move -= n*n
+    return move % ((n-1)*(n-1)), move // ((n-1)*(n-1))
+
+
+def zobrist(n=ROWS):
+    """
+    Random 64 bit keys for hashing positions. Made from a fixed seed so that every process gets the same keys.
+    :return: (pawn keys [side][square], wall keys [dir][slot], walls left keys [side][amount], key of BLACK's turn)
+    """
+    if n not in _zobrist:
+        rand = Random(n)
+        m = n - 1
+        pawns = [[rand.getrandbits(64) for _ in range(n*n)] for _ in range(2)]
+        walls = [[rand.getrandbits(64) for _ in range(m*m)] for _ in range(2)]
+        left = [[rand.getrandbits(64) for _ in range(2*m*m + 1)] for _ in range(2)]
+        _zobrist[n] = pawns, walls, left, rand.getrandbits(64)
+    return _zobrist[n]
+
+
+class State:
+    """
+    Compact game state with no pygame objects in it. Board and Game are views over this class.
+    Side 0 is WHITE (starts on the bottom row and needs to reach row 0), side 1 is BLACK (starts on top, needs to reach
+    row n-1).
+    """
+    __slots__ = ('n', 'tables', 'pawns', 'hwalls', 'vwalls', 'walls_left', 'turn', 'blocked', 'free', 'dists', 'changed',
+                 'key', 'history')
+
+    def __init__(self, n=ROWS, walls=None):
+        """
+        :param n: Board size
+        :param walls: Walls of each player, None for wall_count(n)
+        """
+        if walls is None:
+            walls = wall_count(n)
+        self.n = n
+        self.tables = tables(n)  # Static lookup tables of the board size
+        self.pawns = [to_square(((n-1)//2, n-1), n), to_square(((n-1)//2, 0), n)]  # Square of each pawn
+        self.hwalls = 0  # Bitmask of horizontal wall slots
+        self.vwalls = 0  # Bitmask of vertical wall slots
+        self.walls_left = [walls, walls]
+        self.turn = 0  # Side to move
+        self.blocked = self.tables.blocked[:]  # Direction bits of the sides of each square that have a wall (or border)
+        self.free = self.tables.free[:]
+        # Bitboards of the squares that can be left through their left, top, right and bottom side (used by paths)
+        self.dists = [None, None]  # (dist, layers) distance maps to the goal row of each side, made when first needed
+        self.changed = []  # Squares next to walls added or removed since the distance maps were last brought up to date
+        pawn_keys, _, left_keys, _ = zobrist(n)
+        self.key = pawn_keys[0][self.pawns[0]] ^ pawn_keys[1][self.pawns[1]] ^ left_keys[0][walls] ^ left_keys[1][walls]
+        # Zobrist hash of pawns, walls, walls left and side to move. Kept up to date by add_wall, remove_wall and play
+        self.history = []  # (move, previous pawn square, saved distance maps) of every move played with push
+
+    def clone(self):
+        """
+        Cheap copy of the state, only its few small lists are copied. The copy starts with an empty history, so pop can't
+        take back the moves played before it was made.
+        """
+        state = State.__new__(State)
+        state.n = self.n
+        state.tables = self.tables
+        state.pawns = self.pawns[:]
+        state.hwalls, state.vwalls = self.hwalls, self.vwalls
+        state.walls_left = self.walls_left[:]
+        state.turn = self.turn
+        state.blocked = self.blocked[:]
+        state.free = self.free[:]
+        state.dists = [None if cached is None else (cached[0][:], cached[1][:]) for cached in self.dists]
+        state.changed = self.changed[:]
+        state.key = self.key
+        state.history = []
+        return state
+
+    def distance_map(self, side):
+        """
+        :return: List with the distance from every square to the goal row of side. Kept up to date when walls change, so
+        it must not be changed by the caller
+        """
+        if self.changed:  # Walls changed since the maps were last used, update them all at once
+            for i, cached in enumerate(self.dists):
+                if cached is not None:
+                    if self.history:  # The maps may be saved by push, so pop can give them back. Update copies instead
+                        cached = self.dists[i] = (cached[0][:], cached[1][:])
+                    update_distances(self, cached[0], cached[1], self.changed)
+            self.changed = []
+        if self.dists[side] is None:
+            self.dists[side] = distance_map(self, side)
+        return self.dists[side][0]
+
+    def distance(self, side=None):
+        """
+        :return: Amount of steps the pawn of side (side to move if None) needs to reach its goal row if it wasn't blocked
+        by the other pawn. paths.UNREACHABLE if it can't get there
+        """
+        if side is None:
+            side = self.turn
+        return self.distance_map(side)[self.pawns[side]]
+
+    def is_blocked(self, sq, d):
+        """
+        :param sq: Square
+        :param d: Direction bit (LEFT, UP, RIGHT, DOWN)
+        :return: True if there is a wall (or the border of the board) on side d of sq
+        """
+        return bool(self.blocked[sq] & d)
+
+    def fits(self, slot, dir):
+        """
+        :return: True if a wall of direction dir in slot doesn't overlap or cross any wall that was already placed
+        """
+        hmask, vmask = self.tables.conflicts[dir][slot]
+        return not (self.hwalls & hmask or self.vwalls & vmask)
+
+    def free_slots(self):
+        """
+        All slots where a wall would fit at once, with shifts of the wall bitmasks
+        :return: Bitmasks (horizontal, vertical) of the slots where a wall doesn't overlap or cross another wall
+        """
+        m = self.n - 1
+        full, first_col, last_col = self.tables.slot_masks
+        h, v = self.hwalls, self.vwalls
+        hfree = ~(h | v | (h << 1 & ~first_col) | (h >> 1 & ~last_col)) & full
+        vfree = ~(h | v | v << m | v >> m) & full
+        return hfree, vfree
+
+    def legal_walls(self):
+        """
+        All legal wall placements of the side to move. A wall can only cut a pawn off its goal row if it blocks a step of
+        that pawn's current shortest path, so the paths are only checked again for the walls that do.
+        :return: Bitmasks (horizontal, vertical) of the slots where a wall can be placed
+        """
+        if not self.walls_left[self.turn]:
+            return 0, 0
+        masks = list(self.free_slots())
+        cuts = []  # [side] -> (horizontal, vertical) slots that cut the shortest path of side
+        for side in (0, 1):
+            path = shortest_path(self, side)  # From the distance map
+            if path is None:  # A pawn is already cut off, no wall can be placed
+                return 0, 0
+            cuts.append(cut_slots(path, self.n))
+        for dir in (HORIZONTAL, VERTICAL):
+            for slot in bits(masks[dir] & (cuts[0][dir] | cuts[1][dir])):
+                self._set_wall(slot, dir)
+                if any(cuts[side][dir] >> slot & 1 and not reachable(self, side) for side in (0, 1)):  # Only the cut paths
+                    masks[dir] &= ~(1 << slot)
+                self._clear_wall(slot, dir)
+        return masks[0], masks[1]
+
+    def wall_edges(self, slot, dir):
+        """
+        :return: The 4 (square, direction bit) sides that a wall of direction dir in slot blocks
+        """
+        return self.tables.edges[dir][slot]
+
+    def _set_wall(self, slot, dir):
+        """
+        Put a wall in the bitmasks and block the sides next to it. Doesn't touch the distance maps
+        """
+        if dir == HORIZONTAL:
+            self.hwalls |= 1 << slot
+        else:
+            self.vwalls |= 1 << slot
+        for sq, d in self.tables.edges[dir][slot]:
+            self.blocked[sq] |= d
+        for i, mask in self.tables.clears[dir][slot]:
+            self.free[i] &= ~mask
+
+    def _clear_wall(self, slot, dir):
+        """
+        Opposite of _set_wall
+        """
+        if dir == HORIZONTAL:
+            self.hwalls &= ~(1 << slot)
+        else:
+            self.vwalls &= ~(1 << slot)
+        for sq, d in self.tables.edges[dir][slot]:
+            self.blocked[sq] &= ~d
+        for i, mask in self.tables.clears[dir][slot]:
+            self.free[i] |= mask
+
+    def add_wall(self, slot, dir):
+        """
+        Put a wall on the board. Doesn't check anything and doesn't change walls_left or turn.
+        """
+        self._set_wall(slot, dir)
+        self.key ^= zobrist(self.n)[1][dir][slot]
+        self._update_distances(slot, dir)
+
+    def remove_wall(self, slot, dir):
+        """
+        Opposite of add_wall
+        """
+        self._clear_wall(slot, dir)
+        self.key ^= zobrist(self.n)[1][dir][slot]
+        self._update_distances(slot, dir)
+
+    def _update_distances(self, slot, dir):
+        """
+        Remember that the wall in slot was added or removed. The distance maps that were already made are only updated
+        the next time one of them is needed, so that a wall that is added and removed again without looking at the
+        distances in between (like in a search) doesn't cost two updates.
+        """
+        if self.dists[0] is not None or self.dists[1] is not None:
+            self.changed.extend(sq for sq, _ in self.tables.edges[dir][slot])
+
+    def can_place(self, slot, dir):
+        """
+        :return: True if a wall of direction dir can be placed in slot: it doesn't overlap or cross another wall and both
+        pawns can still reach their goal rows. Doesn't check walls_left.
+        """
+        if not self.fits(slot, dir):
+            return False
+        self._set_wall(slot, dir)  # Place wall only to check the paths
+        legal = reachable(self, 0) and reachable(self, 1)
+        self._clear_wall(slot, dir)
+        return legal
+
+    def is_legal(self, move):
+        """
+        :param move: Any int (for example from the network)
+        :return: True if move is a legal move of the side to move
+        """
+        n = self.n
+        if 0 <= move < n*n:
+            return move in self.pawn_moves()
+        if not (n*n <= move < n*n + 2*(n-1)*(n-1)) or not self.walls_left[self.turn]:
+            return False
+        return self.can_place(*decode_wall(move, n))
+
+    def path_lengths_with(self, slot, dir, sides=(0, 1)):
+        """
+        :return: Shortest path lengths (None if cut off) of sides if there was a wall of direction dir in slot. The wall
+        isn't kept and the distance maps aren't touched
+        """
+        self._set_wall(slot, dir)
+        lengths = [path_length(self, side) for side in sides]
+        self._clear_wall(slot, dir)
+        return lengths
+
+    def pawn_moves(self, side=None):
+        """
+        Legal moves of one pawn, including jumps over the other pawn and side-steps when there is a wall behind it
+        :param side: 0 or 1, side to move if None
+        :return: List of squares the pawn can move to
+        """
+        if side is None:
+            side = self.turn
+        n, blocked = self.n, self.blocked
+        sq, other = self.pawns[side], self.pawns[1-side]
+        dirs = ((UP, -n), (LEFT, -1), (RIGHT, 1), (DOWN, n))
+        moves = []
+        for d, step in dirs:
+            if blocked[sq] & d:  # Wall or border
+                continue
+            if sq + step != other:
+                moves.append(sq + step)
+            elif not blocked[other] & d:  # Nothing behind the other pawn, jump over it
+                moves.append(other + step)
+            else:  # Wall behind the other pawn, step to its sides instead
+                sides = LEFT | RIGHT if d & (UP | DOWN) else UP | DOWN
+                moves.extend(other + step2 for d2, step2 in dirs if d2 & sides and not blocked[other] & d2)
+        return moves
+
+    def play(self, move):
+        """
+        Play move for the side to move and pass the turn. Doesn't check that the move is legal.
+        :param move: Square to move the pawn to, or wall move (see wall_move)
+        """
+        pawn_keys, _, left_keys, turn_key = zobrist(self.n)
+        side = self.turn
+        if move < self.n * self.n:
+            self.key ^= pawn_keys[side][self.pawns[side]] ^ pawn_keys[side][move]
+            self.pawns[side] = move
+        else:
+            self.add_wall(*decode_wall(move, self.n))
+            self.key ^= left_keys[side][self.walls_left[side]] ^ left_keys[side][self.walls_left[side]-1]
+            self.walls_left[side] -= 1
+        self.key ^= turn_key
+        self.turn = 1 - side
+
+    def unplay(self, move, prev):
+        """
+        Take back the last move
+        :param move: Move that was played
+        :param prev: Square the pawn was on before the move (ignored for walls)
+        """
+        pawn_keys, _, left_keys, turn_key = zobrist(self.n)
+        side = self.turn = 1 - self.turn
+        self.key ^= turn_key
+        if move < self.n * self.n:
+            self.key ^= pawn_keys[side][move] ^ pawn_keys[side][prev]
+            self.pawns[side] = prev
+        else:
+            self.remove_wall(*decode_wall(move, self.n))
+            self.key ^= left_keys[side][self.walls_left[side]] ^ left_keys[side][self.walls_left[side]+1]
+            self.walls_left[side] += 1
+
+    def push(self, move):
+        """
+        Play move and remember it so that pop can take it back. For walls the distance maps are saved as well (only the
+        references, nothing is copied), so pop gives them back instead of updating them again.
+        :param move: Square to move the pawn to, or wall move (see wall_move)
+        """
+        saved = None
+        if move >= self.n * self.n:
+            saved = self.dists[:], self.changed, len(self.changed)  # Maps and the squares still pending for them
+        self.history.append((move, self.pawns[self.turn], saved))
+        self.play(move)
+
+    def pop(self):
+        """
+        Take back the last move played with push
+        :return: The move
+        """
+        move, prev, saved = self.history.pop()
+        self.unplay(move, prev)
+        if saved is not None:
+            self.dists, self.changed, pending = saved
+            del self.changed[pending:]  # Squares added to the same list after the push
+        return move
+
+    def winner(self):
+        """
+        :return: 0 if WHITE reached the top row, 1 if BLACK reached the bottom row, None if neither
+        """
+        if self.pawns[0] < self.n:
+            return 0
+        if self.pawns[1] >= self.n * (self.n-1):
+            return 1
+        return None
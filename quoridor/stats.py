@@ -0,0 +1,166 @@
+import json
+import sys
+import threading
+from collections import deque
+from functools import wraps
+from importlib import import_module
+from time import perf_counter, time
+
+HOT_PATHS = {  # Category -> functions counted by Stats, as 'module:function' or 'module:Class.method'
+    'movegen': ('quoridor.state:State.pawn_moves', 'quoridor.search:ordered_moves'),
+    'wall_legality': ('quoridor.state:State.can_place', 'quoridor.state:State.legal_walls',
+                      'quoridor.state:State.free_slots', 'quoridor.state:State.path_lengths_with'),
+    'path_search': ('quoridor.paths:path_length', 'quoridor.paths:reachable', 'quoridor.paths:shortest_path',
+                    'quoridor.paths:distance_map', 'quoridor.paths:update_distances'),
+    'eval': ('quoridor.search:evaluate', 'quoridor.batch:evaluate_states'),
+    'copy': ('quoridor.state:State.clone',),
+    'make_move': ('quoridor.state:State.play', 'quoridor.state:State.push', 'quoridor.state:State.pop'),
+}
+
+
+def _modules():
+    """
+    :return: Modules of the package imported so far
+    """
+    return [module for name, module in list(sys.modules.items()) if name.startswith('quoridor.') and module is not None]
+
+
+def _counted(func, counter):
+    """
+    :param counter: [calls, seconds] added to on every call of the returned function
+    :return: func, counting its calls and the time spent in them (including the functions it calls)
+    """
+    @wraps(func)
+    def counted(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            counter[0] += 1
+            counter[1] += perf_counter() - start
+    return counted
+
+
+class Stats:
+    """
+    Opt-in instrumentation of the rules and the engine. enable puts counting wrappers around the functions of
+    HOT_PATHS (everywhere they were imported in the package) and disable puts the originals back, so while it's off
+    nothing at all is added to the hot paths. The searches also record one entry for every move they pick (see
+    Search.info), which costs one attribute check per move while disabled.
+    """
+    def __init__(self, keep=1000):
+        """
+        :param keep: Amount of per move search entries kept
+        """
+        self.enabled = False
+        self.counters = {}  # 'module:function' -> [calls, seconds]
+        self.searches = deque(maxlen=keep)  # Search.info of the last moves
+        self.remote = {}  # Name -> last report sent by another process (like the engine process of driver.AIDriver)
+        self._originals = {}  # Wrapper put in place by enable -> the function it wraps
+        self._log = None  # (thread, stop event) of start_log
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        paths = [path for category in HOT_PATHS.values() for path in category]
+        for path in paths:
+            import_module(path.partition(':')[0])
+        modules = _modules()
+        for path in paths:
+            module_name, _, name = path.partition(':')
+            owner = sys.modules[module_name]
+            *classes, attribute = name.split('.')
+            for cls in classes:
+                owner = getattr(owner, cls)
+            original = owner.__dict__[attribute]
+            wrapper = _counted(original, self.counters.setdefault(path, [0, 0.0]))
+            self._originals[wrapper] = original
+            if classes:
+                targets = [owner]
+            else:
+                targets = [module for module in modules if module.__dict__.get(attribute) is original]
+            for target in targets:  # Functions are also replaced where they were imported
+                setattr(target, attribute, wrapper)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        modules = _modules()
+        classes = [value for module in modules for value in vars(module).values() if isinstance(value, type)]
+        for owner in modules + classes:
+            for attribute, value in list(vars(owner).items()):  # Also finds wrappers imported after enable
+                if callable(value) and value in self._originals:
+                    setattr(owner, attribute, self._originals[value])
+        self._originals = {}
+        self.enabled = False
+
+    def reset(self):
+        for counter in self.counters.values():
+            counter[:] = [0, 0.0]
+        self.searches.clear()
+        self.remote = {}
+
+    def record_search(self, info):
+        """
+        :param info: Statistics of one search (see Search.info)
+        """
+        self.searches.append(info)
+
+    def report(self):
+        """
+        :return: Dictionary that can be saved as JSON: calls and seconds of every counted function and category, totals
+        of the recorded searches and the last one of them
+        """
+        categories = {}
+        counters = {}
+        for category, paths in HOT_PATHS.items():
+            total = categories[category] = {'calls': 0, 'seconds': 0.0}
+            for path in paths:
+                calls, seconds = self.counters.get(path, (0, 0.0))
+                if calls:
+                    counters[path] = {'calls': calls, 'seconds': round(seconds, 6),
+                                      'us_per_call': round(seconds / calls * 1e6, 2)}
+                total['calls'] += calls
+                total['seconds'] = round(total['seconds'] + seconds, 6)
+        nodes = sum(info['nodes'] for info in self.searches)
+        seconds = sum(info['time'] for info in self.searches)
+        report = {'enabled': self.enabled, 'categories': categories, 'counters': counters,
+                  'searches': {'moves': len(self.searches), 'nodes': nodes, 'seconds': round(seconds, 3),
+                               'nodes_per_sec': round(nodes / seconds) if seconds else 0,
+                               'last': self.searches[-1] if self.searches else None}}
+        if self.remote:
+            report['remote'] = self.remote
+        return report
+
+    def start_log(self, path, interval=10.0):
+        """
+        Append the report (see report) as one JSON line to the file in path every interval seconds, from a daemon thread,
+        until stop_log
+        """
+        self.stop_log()
+        stop = threading.Event()
+
+        def write():
+            with open(path, 'a') as file:
+                while not stop.wait(interval):
+                    self.write(file)
+                self.write(file)  # Last report when the log is stopped
+
+        thread = threading.Thread(target=write, daemon=True)
+        thread.start()
+        self._log = (thread, stop)
+
+    def stop_log(self):
+        if self._log is not None:
+            thread, stop = self._log
+            stop.set()
+            thread.join()
+            self._log = None
+
+    def write(self, file):
+        file.write(json.dumps(dict(time=round(time(), 3), **self.report()), separators=(',', ':')) + '\n')
+        file.flush()
+
+
+STATS = Stats()  # Instrumentation of this process
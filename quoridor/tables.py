@@ -0,0 +1,73 @@
+HORIZONTAL, VERTICAL = 0, 1  # Wall directions, same values as Wall.dir
+LEFT, UP, RIGHT, DOWN = 1, 2, 4, 8  # Direction bits. Same order as the walls list that tiles used to have
+INDEX = {LEFT: 0, UP: 1, RIGHT: 2, DOWN: 3}  # Index of each direction in State.free
+
+_tables = {}  # Board size -> Tables
+
+
+class Tables:
+    """
+    Static tables of one board size, so that the rules only need lookups and bit operations. Made once for every board
+    size (see tables), never changed.
+    """
+    __slots__ = ('n', 'neighbours', 'blocked', 'free', 'slot_masks', 'edges', 'clears', 'conflicts', 'cuts')
+
+    def __init__(self, n):
+        self.n = n
+        m = n - 1
+        self.neighbours = []  # [square] -> ((direction bit, square next to it), ...) for the sides that aren't border
+        for sq in range(n*n):
+            x, y = sq % n, sq // n
+            self.neighbours.append(tuple((d, sq + step) for d, step, inside in
+                                         ((LEFT, -1, x > 0), (UP, -n, y > 0), (RIGHT, 1, x < m), (DOWN, n, y < m))
+                                         if inside))
+        self.blocked = bytearray(n*n)  # State.blocked of the empty board: only the borders
+        for sq in range(n*n):
+            x, y = sq % n, sq // n
+            self.blocked[sq] = (x == 0)*LEFT | (y == 0)*UP | (x == m)*RIGHT | (y == m)*DOWN
+        all_squares = (1 << n*n) - 1
+        self.free = [all_squares & ~sum(1 << sq for sq in range(n*n) if self.blocked[sq] & d)
+                     for d in (LEFT, UP, RIGHT, DOWN)]  # State.free of the empty board
+        first_col = sum(1 << row*m for row in range(m))  # Slots with cx == 1
+        self.slot_masks = ((1 << m*m) - 1, first_col, first_col << m-1)  # All slots, slots with cx == 1 and cx == n-1
+        self.edges = ([], [])  # [dir][slot] -> the 4 (square, direction bit) sides a wall blocks
+        self.clears = ([], [])  # [dir][slot] -> ((State.free index, bitboard of the squares it blocks there), ...)
+        self.conflicts = ([], [])  # [dir][slot] -> (horizontal, vertical) bitmasks of the slots of walls it can't meet
+        self.cuts = []  # [square] -> (horizontal mask of the slots that cut its step down, vertical mask of its step right)
+        for slot in range(m*m):
+            sq = slot // m * n + slot % m  # Square on the top left of the wall's middle point
+            cx, cy = slot % m, slot // m
+            self.edges[HORIZONTAL].append(((sq, DOWN), (sq+1, DOWN), (sq+n, UP), (sq+n+1, UP)))
+            self.edges[VERTICAL].append(((sq, RIGHT), (sq+n, RIGHT), (sq+1, LEFT), (sq+n+1, LEFT)))
+            self.clears[HORIZONTAL].append(((INDEX[DOWN], 3 << sq), (INDEX[UP], 3 << sq+n)))
+            self.clears[VERTICAL].append(((INDEX[RIGHT], 1 << sq | 1 << sq+n), (INDEX[LEFT], 1 << sq+1 | 1 << sq+n+1)))
+            same_row = 1 << slot | (1 << slot-1 if cx > 0 else 0) | (1 << slot+1 if cx < m-1 else 0)  # Overlapping it
+            same_col = 1 << slot | (1 << slot-m if cy > 0 else 0) | (1 << slot+m if cy < m-1 else 0)
+            self.conflicts[HORIZONTAL].append((same_row, 1 << slot))  # The vertical wall in the same slot crosses it
+            self.conflicts[VERTICAL].append((1 << slot, same_col))
+        for sq in range(n*n):
+            x, y = sq % n, sq // n
+            down = right = 0
+            for cx in (x, x+1):  # Horizontal walls centered on row y+1 cut the step between rows y and y+1
+                if 0 < cx < n and y < m:
+                    down |= 1 << y*m + cx-1
+            for cy in (y, y+1):  # Vertical walls centered on column x+1 cut the step between columns x and x+1
+                if 0 < cy < n and x < m:
+                    right |= 1 << (cy-1)*m + x
+            self.cuts.append((down, right))
+
+    def __deepcopy__(self, memo):
+        return self  # Never changed, copies of a State can share it
+
+    def __reduce__(self):
+        return tables, (self.n,)  # Pickled as the board size, the process that loads it uses its own tables
+
+
+def tables(n):
+    """
+    :param n: Board size
+    :return: Tables of board size n, made the first time they are needed
+    """
+    if n not in _tables:
+        _tables[n] = Tables(n)
+    return _tables[n]
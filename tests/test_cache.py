@@ -0,0 +1,63 @@
+from random import Random
+from quoridor.state import State, wall_move, decode_wall
+from quoridor.paths import bits
+from quoridor.cache import Cache, canonical_key, mirror_move, mirror_square, mirror_slots
+
+
+def mirrored_games(rand, n, count):
+    """
+    :return: List of (state, state of the same moves mirrored from left to right) of random games
+    """
+    pairs = []
+    for _ in range(count):
+        state, mirror = State(n), State(n)  # The pawns start in the middle column, the start is its own mirror image
+        for _ in range(rand.randrange(1, 12)):
+            hmask, vmask = state.legal_walls()
+            walls = [wall_move(slot, dir, n) for dir, mask in enumerate((hmask, vmask)) for slot in bits(mask)]
+            move = rand.choice(walls) if walls and rand.random() < 0.5 else rand.choice(state.pawn_moves())
+            state.play(move)
+            mirror.play(mirror_move(move, n))
+            if state.winner() is not None:
+                break
+        pairs.append((state, mirror))
+    return pairs
+
+
+def test_mirror():
+    for n in (5, 9):
+        for sq in range(n*n):
+            assert mirror_square(mirror_square(sq, n), n) == sq
+            assert mirror_square(sq, n) // n == sq // n
+        for move in range(n*n + 2*(n-1)*(n-1)):
+            assert mirror_move(mirror_move(move, n), n) == move
+            if move >= n*n:
+                slot, dir = decode_wall(move, n)
+                assert decode_wall(mirror_move(move, n), n)[1] == dir
+                assert mirror_slots(1 << slot, n) == 1 << decode_wall(mirror_move(move, n), n)[0]
+
+
+def test_canonical_key():
+    rand = Random(0)
+    for state, mirror in mirrored_games(rand, 9, 30):
+        key, mirrored = canonical_key(state)
+        other, other_mirrored = canonical_key(mirror)
+        assert key == other == min(state.key, mirror.key)
+        assert mirrored == (key != state.key) and other_mirrored == (key != mirror.key)
+        assert mirror_slots(state.hwalls, 9) == mirror.hwalls and mirror_slots(state.vwalls, 9) == mirror.vwalls
+
+
+def test_lookup_of_mirror_image(tmp_path):
+    rand = Random(1)
+    with Cache(str(tmp_path / 'cache.sqlite'), commit_every=4) as cache:
+        pairs = [(state, mirror) for state, mirror in mirrored_games(rand, 9, 20) if state.winner() is None]
+        for state, _ in pairs:
+            cache.put(state, state.pawn_moves()[0], 7, 5, state.legal_walls())
+        for state, mirror in pairs:
+            for position in (state, mirror):
+                entry = cache.get(position)
+                assert entry['move'] == (state.pawn_moves()[0] if position is state else
+                                         mirror_move(state.pawn_moves()[0], 9))
+                assert entry['walls'] == position.legal_walls()
+                assert entry['score'] == 7 and entry['depth'] == 5
+                assert cache.get(position, 6) is None  # Not searched deep enough
+        assert cache.get(State(5)) is None
@@ -0,0 +1,77 @@
+from collections import deque
+from random import Random
+from quoridor.state import State, LEFT, UP, RIGHT, DOWN
+from quoridor.paths import UNREACHABLE, bits
+
+
+def full_distances(state, side):
+    """
+    Plain breadth first search from the goal row of side, square by square
+    """
+    n = state.n
+    dist = [UNREACHABLE] * (n*n)
+    goal = range(n) if side == 0 else range(n*(n-1), n*n)
+    todo = deque(goal)
+    for sq in goal:
+        dist[sq] = 0
+    while todo:
+        sq = todo.popleft()
+        for d, next_sq in ((LEFT, sq-1), (UP, sq-n), (RIGHT, sq+1), (DOWN, sq+n)):
+            if not state.is_blocked(sq, d) and dist[next_sq] == UNREACHABLE:  # Borders are blocked too
+                dist[next_sq] = dist[sq] + 1
+                todo.append(next_sq)
+    return dist
+
+
+def random_walls(state, rand):
+    """
+    :return: (slot, dir) of a random wall that fits in state, None if none does
+    """
+    free = [(slot, dir) for dir, mask in enumerate(state.free_slots()) for slot in bits(mask)]
+    return rand.choice(free) if free else None
+
+
+def check_maps(state):
+    for side in (0, 1):
+        assert state.distance_map(side) == full_distances(state, side)
+
+
+def test_add_and_remove_walls():
+    rand = Random(0)
+    for n in (5, 9):
+        for _ in range(60):
+            state = State(n)
+            check_maps(state)
+            placed = []
+            for _ in range(rand.randrange(1, 3 * n)):  # Walls can cut the goal row off here, the maps must say so
+                wall = random_walls(state, rand)
+                if wall is None:
+                    break
+                state.add_wall(*wall)
+                placed.append(wall)
+                if rand.random() < 0.5:
+                    check_maps(state)
+                if placed and rand.random() < 0.2:
+                    state.remove_wall(*placed.pop(rand.randrange(len(placed))))
+            check_maps(state)
+            while placed:
+                state.remove_wall(*placed.pop())
+                check_maps(state)
+
+
+def test_push_pop():
+    rand = Random(1)
+    for _ in range(30):
+        state = State(9)
+        check_maps(state)
+        for _ in range(rand.randrange(1, 20)):
+            if state.winner() is not None:
+                break
+            hmask, vmask = state.legal_walls()
+            moves = state.pawn_moves() + [state.n**2 + slot for slot in bits(hmask)] + \
+                [state.n**2 + (state.n-1)**2 + slot for slot in bits(vmask)]
+            state.push(rand.choice(moves))
+            check_maps(state)
+        while state.history:
+            state.pop()
+            check_maps(state)
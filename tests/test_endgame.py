@@ -0,0 +1,63 @@
+from random import Random
+from quoridor.state import State
+from quoridor.paths import bits, UNREACHABLE
+from quoridor.endgame import solve, WIN, LOSS, DRAW
+
+DRAW_DEPTH = 16  # Plies searched to check that a draw isn't decided
+
+
+def minimax(state, depth, memo):
+    """
+    Brute force search of the pawn moves. A side without moves can't lose (like in endgame.solve_walls)
+    :return: WIN or LOSS for the side to move if the game is decided within depth plies, None if it isn't
+    """
+    if state.winner() is not None:
+        return LOSS  # The side that just moved won
+    if depth == 0:
+        return None
+    key = (state.pawns[0], state.pawns[1], state.turn, depth)
+    if key not in memo:
+        results = []
+        for move in state.pawn_moves():
+            child = state.clone()
+            child.play(move)
+            results.append(minimax(child, depth - 1, memo))
+        memo[key] = WIN if LOSS in results else LOSS if results and all(result == WIN for result in results) else None
+    return memo[key]
+
+
+def positions(rand, n, count):
+    """
+    :return: States without walls left, with random walls and pawns
+    """
+    states = []
+    for _ in range(count):
+        state = State(n, 0)
+        for _ in range(rand.randrange(0, 2 * n)):
+            free = [(slot, dir) for dir, mask in enumerate(state.free_slots()) for slot in bits(mask)]
+            slot, dir = rand.choice(free)
+            if state.can_place(slot, dir):
+                state.add_wall(slot, dir)
+        white = [sq for sq in range(n, n*(n-1)) if state.distance_map(0)[sq] < UNREACHABLE]  # Not on a goal row
+        black = [sq for sq in range(n, n*(n-1)) if state.distance_map(1)[sq] < UNREACHABLE]  # and not cut off from it
+        state.pawns[0] = rand.choice(white)
+        state.pawns[1] = rand.choice([sq for sq in black if sq != state.pawns[0]])
+        state.turn = rand.randrange(2)
+        states.append(state)
+    return states
+
+
+def test_solve_matches_minimax():
+    rand = Random(0)
+    for state in positions(rand, 5, 150):
+        memo = {}
+        result, plies, move = solve(state)
+        if result == DRAW:
+            assert minimax(state, DRAW_DEPTH, memo) is None
+            continue
+        assert minimax(state, plies, memo) == result  # Decided in plies
+        assert minimax(state, plies - 1, memo) is None  # Not sooner
+        child = state.clone()
+        child.play(move)
+        if child.winner() is None:
+            assert solve(child)[:2] == (-result, plies - 1)  # The best move keeps the fastest win / slowest loss
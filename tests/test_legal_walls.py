@@ -0,0 +1,55 @@
+from random import Random
+from quoridor.state import State, wall_move, HORIZONTAL, VERTICAL
+from quoridor.paths import bits, reachable
+
+
+def brute_force(state):
+    """
+    :return: (horizontal, vertical) masks of the slots where a wall fits and leaves both goal rows reachable, checked one
+    slot at a time on a copy
+    """
+    masks = [0, 0]
+    for dir in (HORIZONTAL, VERTICAL):
+        for slot in range((state.n-1) ** 2):
+            if state.fits(slot, dir):
+                copy = state.clone()
+                copy.add_wall(slot, dir)
+                if reachable(copy, 0) and reachable(copy, 1):
+                    masks[dir] |= 1 << slot
+    return tuple(masks)
+
+
+def positions(rand, n, walls, count):
+    """
+    :return: States of random games with walls walls for each side, mostly walls so that many paths are cut
+    """
+    states = []
+    for _ in range(count):
+        state = State(n, walls)
+        for _ in range(rand.randrange(0, 4 * n)):
+            if state.winner() is not None:
+                break
+            hmask, vmask = state.legal_walls()
+            moves = [wall_move(slot, dir, n) for dir, mask in enumerate((hmask, vmask)) for slot in bits(mask)]
+            state.play(rand.choice(moves) if moves and rand.random() < 0.7 else rand.choice(state.pawn_moves()))
+        states.append(state)
+    return states
+
+
+def test_legal_walls():
+    rand = Random(0)
+    for n, walls in ((3, 4), (5, 6), (9, 10)):
+        for state in positions(rand, n, walls, 40):
+            if state.walls_left[state.turn]:
+                assert state.legal_walls() == brute_force(state)
+            else:
+                assert state.legal_walls() == (0, 0)
+
+
+def test_can_place():
+    rand = Random(1)
+    for state in positions(rand, 9, 10, 20):
+        hmask, vmask = brute_force(state)
+        for dir, mask in ((HORIZONTAL, hmask), (VERTICAL, vmask)):
+            for slot in range(64):
+                assert state.can_place(slot, dir) == bool(mask >> slot & 1)
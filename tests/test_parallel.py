@@ -0,0 +1,21 @@
+from quoridor.parallel import SharedTable
+from quoridor.search import EXACT, LOWER, UPPER
+
+
+def test_packing_round_trip():
+    table = SharedTable(8)
+    try:
+        cases = [(0, -(1 << 31), EXACT, None), (255, (1 << 31) - 1, UPPER, 0xfffe), (1, 0, LOWER, 0),
+                 (17, -100000, EXACT, 80), (64, 100000, UPPER, 209)]
+        for age in (0, 31, 32, 130):  # Ages are kept modulo 32
+            table.age = age
+            for key, (depth, score, kind, move) in enumerate(cases, 1 << 40):
+                table.put(key, depth, score, kind, move)
+                assert table.get(key) == (depth, score, kind, move, age % 32)
+            table.clear()
+            assert all(table.get(key) is None for key in range(1 << 40, (1 << 40) + len(cases)))
+        table.put((1 << 64) - 1, 3, -5, LOWER, 12)  # Highest key
+        assert table.get((1 << 64) - 1)[:4] == (3, -5, LOWER, 12)
+        assert table.get((1 << 64) - 9) is None  # Same entry, other key
+    finally:
+        table.close(unlink=True)
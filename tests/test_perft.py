@@ -0,0 +1,15 @@
+import pytest
+from quoridor.state import State
+from quoridor.perft import perft, divide, check, reference_perft
+
+
+def test_start_counts():
+    assert [perft(State(), depth) for depth in (1, 2)] == [131, 16677]
+    assert sum(divide(State(), 2).values()) == 16677
+
+
+def test_matches_reference():
+    pytest.importorskip('pygame')  # The reference runs Board.possible_moves
+    state = State(5)
+    assert check(state, 2) == []
+    assert perft(state, 2) == reference_perft(state, 2) == sum(divide(state, 2, reference=True).values())
@@ -0,0 +1,65 @@
+import os
+from random import Random
+from quoridor.state import State, wall_move
+from quoridor.paths import bits
+from quoridor.records import GameWriter, GameReader, reindex
+
+
+def random_game(rand, n, walls):
+    """
+    :return: (moves, winner) of a random game, None for the winner if it was stopped before the end
+    """
+    state = State(n, walls)
+    moves = []
+    while state.winner() is None and len(moves) < 40 * n:
+        hmask, vmask = state.legal_walls()
+        wall_moves = [wall_move(slot, dir, n) for dir, mask in enumerate((hmask, vmask)) for slot in bits(mask)]
+        move = rand.choice(wall_moves) if wall_moves and rand.random() < 0.2 else rand.choice(state.pawn_moves())
+        state.play(move)
+        moves.append(move)
+    return moves, state.winner()
+
+
+def test_round_trip(tmp_path):
+    rand = Random(0)
+    path = str(tmp_path / 'games.qgdb')
+    games = []
+    with GameWriter(path) as writer:
+        for i, (n, walls) in enumerate(((5, 3), (9, 10), (19, 22), (9, 0), (5, 3))):
+            moves, winner = random_game(rand, n, walls)
+            meta = {'i': i} if i % 2 else None
+            assert writer.append(moves, winner, n, walls, meta) == i
+            games.append((n, walls, winner, moves, meta or {}))
+    for rebuilt in (False, True):
+        if rebuilt:  # The index again from the records alone
+            os.remove(path + '.idx')
+            assert reindex(path) == len(games)
+        with GameReader(path) as reader:
+            assert len(reader) == len(games)
+            for i, (n, walls, winner, moves, meta) in enumerate(games):
+                assert reader.header(i) == {'n': n, 'walls': walls, 'winner': winner, 'plies': len(moves), 'meta': meta}
+                assert reader.moves(i) == moves
+
+
+def test_append_to_open_file(tmp_path):
+    rand = Random(1)
+    path = str(tmp_path / 'games.qgdb')
+    with GameWriter(path) as writer:
+        writer.append(*random_game(rand, 9, 10), 9, 10)
+    with GameReader(path) as reader, GameWriter(path) as writer:
+        assert writer.append(*random_game(rand, 5, 3), 5, 3) == 1
+        assert len(reader) == 1  # Readers see the games there were when they opened
+        assert reader.header(0)['n'] == 9
+    with GameReader(path) as reader:
+        assert [header['n'] for header in reader] == [9, 5]
+
+
+def test_empty(tmp_path):
+    path = str(tmp_path / 'empty.qgdb')
+    GameWriter(path).close()
+    with GameReader(path) as reader:
+        assert len(reader) == 0 and list(reader) == []
+    os.remove(path + '.idx')
+    assert reindex(path) == 0
+    with GameReader(path) as reader:
+        assert len(reader) == 0
@@ -0,0 +1,70 @@
+from random import Random
+from quoridor.state import State, wall_move
+from quoridor.paths import bits
+from quoridor.search import Search, TranspositionTable, evaluate, ordered_moves, WIN, EXACT, LOWER
+
+
+def negamax(state, depth, ply=0):
+    """
+    Plain fixed depth negamax over the same moves and evaluation as the search, without pruning or table
+    """
+    if state.winner() is not None:
+        return -WIN + ply
+    if depth == 0:
+        return evaluate(state)
+    best = None
+    for move in ordered_moves(state):
+        child = state.clone()
+        child.play(move)
+        score = -negamax(child, depth - 1, ply + 1)
+        best = score if best is None else max(best, score)
+    return evaluate(state) if best is None else best
+
+
+def positions(rand, n, count):
+    """
+    :return: States of random games on a board of size n, with walls still left for both sides
+    """
+    states = []
+    while len(states) < count:
+        state = State(n, 3)
+        for _ in range(rand.randrange(0, 8)):
+            hmask, vmask = state.legal_walls()
+            walls = [wall_move(slot, dir, n) for dir, mask in enumerate((hmask, vmask)) for slot in bits(mask)]
+            state.play(rand.choice(walls) if walls and rand.random() < 0.3 else rand.choice(state.pawn_moves()))
+            if state.winner() is not None:
+                break
+        if state.winner() is None and state.walls_left[0] and state.walls_left[1]:
+            states.append(state)
+    return states
+
+
+def test_table_replacement():
+    table = TranspositionTable(4)
+    table.put(1, 5, 10, EXACT, 7)
+    table.put(5, 3, 20, EXACT, 8)  # Same entry, shallower: the deeper one is kept
+    assert table.get(1)[:4] == (5, 10, EXACT, 7) and table.get(5) is None
+    table.put(5, 6, 30, LOWER, 9)  # Deeper: replaces it
+    assert table.get(5)[:4] == (6, 30, LOWER, 9) and table.get(1) is None
+    table.put(5, 1, 40, EXACT, 3)  # Same position again: the newer result is kept
+    assert table.get(5)[:4] == (1, 40, EXACT, 3)
+    table.put(9, 0, 50, EXACT, 2)  # Shallower, but the old entry is from this search: kept
+    assert table.get(9) is None
+    table.new_search()
+    table.put(9, 0, 50, EXACT, 2)  # The old entry is left over from an earlier search: replaced
+    assert table.get(9)[:4] == (0, 50, EXACT, 2)
+
+
+def test_best_move_matches_negamax():
+    rand = Random(0)
+    for state in positions(rand, 5, 6):
+        for depth in (1, 2, 3):
+            search = Search()
+            key = state.key
+            move = search.best_move(state, None, None, depth)
+            assert state.key == key  # Left the way it was
+            expected = negamax(state, depth)
+            assert search.score == expected
+            child = state.clone()
+            child.play(move)
+            assert -negamax(child, depth - 1, 1) == expected  # The move it picked is one of the best